@@ -18,13 +18,57 @@ class Config:
     
     MAX_WORKERS_EMBEDDINGS = 4  # Embedding parallelization. Increase if GPU is powerful,
                                # decrease if using CPU or memory errors occur
+
+    TORCH_THREADS = 0  # Threads used by the embedding backend (0 = library default)
+
+    # Host tuning parameters (values tried by the tuning command, best ones are saved per host
+    # and override MAX_WORKERS_PDF, EMBEDDING_BATCH_SIZE, MAX_WORKERS_EMBEDDINGS and TORCH_THREADS)
+    TUNE_SAMPLE_PDFS = 8  # PDFs sampled from the corpus for the trials
+    TUNE_SAMPLE_CHUNKS = 512  # Chunks embedded by each embedding trial
+    TUNE_PDF_WORKERS = [1, 2, 4, 8]
+    TUNE_BATCH_SIZES = [16, 32, 64, 128]
+    TUNE_EMBEDDING_WORKERS = [1, 2, 4]
+    TUNE_TORCH_THREADS = [0] + [n for n in (2, 4, 8) if n <= (os.cpu_count() or 1)]  # 0 = library default
     
+    # Memory governor parameters
+    MEMORY_LIMIT_MB = 0  # Memory ceiling of ingestion in MB (0 disables the governor)
+                         # When approached, PDF workers, embedding batch size and embedding workers are reduced
+    MEMORY_SAMPLE_INTERVAL = 0.5  # Seconds between two memory measurements
+    MEMORY_HIGH_WATERMARK = 0.85  # Fraction of the ceiling above which ingestion is throttled
+    MEMORY_LOW_WATERMARK = 0.60  # Fraction of the ceiling below which ingestion scales back up
+    MIN_EMBEDDING_BATCH_SIZE = 4  # Smallest batch size used under memory pressure
+    EMBEDDING_WINDOW_SIZE = 4096  # Chunks embedded before their vectors can be flushed to the index
+    MAX_PENDING_VECTORS = 50000  # Vectors kept pending before being flushed to the index
+    EMBEDDING_MEMMAP_THRESHOLD_MB = 1024  # Embedding matrices larger than this are disk-backed memmaps
+
     # Deduplication parameters
     DEDUP_THRESHOLD = 0.90  # Similarity threshold (0.0 to 1.0):
                            # - Closer to 1.0 -> stricter deduplication, keeps more texts
                            # - Closer to 0.0 -> aggressive deduplication, fewer duplicates
                            # - 0.90 is a good compromise, 0.95 to be conservative
     
+    # Text deduplication parameters (before embedding)
+    TEXT_DEDUP_ENABLED = True  # Skip embedding of chunks whose text duplicates an earlier chunk
+                               # Duplicates are kept in metadata as aliases of their canonical chunk
+    TEXT_DEDUP_THRESHOLD = 0.85  # Estimated Jaccard similarity of word shingles (0.0 to 1.0)
+                                 # 1.0 -> exact duplicates only (after normalization)
+    SHINGLE_SIZE = 5  # Number of words per shingle
+    MINHASH_PERMUTATIONS = 128  # Signature length. Increase -> more accurate similarity but slower
+    MINHASH_BANDS = 16  # LSH bands, must divide MINHASH_PERMUTATIONS
+                        # More bands -> more candidates checked, fewer near duplicates missed
+
+    # Index parameters
+    INDEX_BLOCK_SIZE = 10000  # Vectors read or written at once when streaming an index (merge, export)
+    REDUCTION_METHOD = None  # Dimensionality reduction of new databases:
+                             # - None: vectors stored at the model dimension
+                             # - 'pca': projection learned on the first embeddings of the database
+                             # - 'truncate': keep the first REDUCTION_DIM components
+    REDUCTION_DIM = 128  # Reduced dimension. Lower -> smaller index and faster search but lower recall
+    REDUCTION_TRAIN_SIZE = 20000  # Embeddings used to learn the PCA projection
+    REDUCTION_REPORT_DIMS = [32, 64, 128, 256]  # Dimensions compared by the reduction report
+    REDUCTION_REPORT_SAMPLE = 20000  # Vectors of the loaded database used by the report
+    REDUCTION_REPORT_QUERIES = 500  # Sample vectors used as queries by the report
+
     # Search parameters
     DEFAULT_TOP_K = 5  # Number of results displayed per search
                       # Increase for more results but may include less relevant matches
@@ -45,14 +89,40 @@ class Config:
     DEFAULT_PAGES_PER_SECOND = 100.0  # Default value if no benchmark
     DEFAULT_MB_PER_PAGE = 0.1       # Default value if no benchmark
     
+    MAX_WORKERS_PAGE_COUNT = 4  # Processes counting PDF pages in parallel before ingestion
+    
     # Benchmark variables (updated by run_benchmark)
     pages_per_second = DEFAULT_PAGES_PER_SECOND
     mb_per_page = DEFAULT_MB_PER_PAGE
 
+    # Cache and per-host profile folders
+    CACHE_ROOT = "cache"  # Root folder for caches that can be safely deleted
+    PAGE_COUNT_CACHE_PATH = os.path.join(CACHE_ROOT, "page_counts.json")  # Page counts keyed by file size and mtime
+    PAGE_CACHE_ENABLED = True  # Cache extracted page text so re-chunking or model changes skip PDF parsing
+    PAGE_CACHE_ROOT = os.path.join(CACHE_ROOT, "pages")  # Compressed page text keyed by PDF hash and page number
+    PAGE_CACHE_COMPRESSION = 6  # gzip level (1 = fastest, 9 = smallest)
+    EMBEDDING_SCRATCH_ROOT = os.path.join(CACHE_ROOT, "embeddings")  # Scratch files of disk-backed embedding matrices
+    HOST_PROFILE_ROOT = "host_profiles"  # Calibrations saved per host (cost model, ...)
+    METRICS_ROOT = "metrics"  # Metrics recorded during ingestion (memory adjustments, ...)
+
     # Database folder
     DATABASE_ROOT = os.path.join(":", "databases")  # Root folder to store all databases
     DATABASE_DEFAULT_NAME = "DB_default_name"  # Default database name
 
+    # Snapshot parameters
+    SNAPSHOT_KEEP_VERSIONS = 3  # Number of versions kept on disk per database (0 = keep all)
+    SNAPSHOT_POLL_INTERVAL = 5.0  # Seconds between checks for a new version by loaded databases
+                                  # 0 disables hot reload
+
+    # Database cache parameters
+    DB_CACHE_MEMORY_MB = 2048  # Estimated memory of databases kept loaded in the process,
+                               # least recently used ones are unloaded above it
+    DB_CACHE_CHUNK_OVERHEAD = 200  # Estimated bytes per chunk in memory on top of its text
+
+    # Distributed ingestion parameters
+    SHARD_COUNT = 4  # Default number of shards for distributed builds
+    MAX_WORKERS_SHARDS = 2  # Shards built in parallel by a local build (each process loads the model)
+
     # Exemple of section patterns
     section_patterns = [
         # Headers and structural elements
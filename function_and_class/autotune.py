@@ -0,0 +1,158 @@
+import time
+import random
+import threading
+import itertools
+import psutil
+from typing import Optional
+from tqdm import tqdm
+from config import Config
+from .cost_model import host_profile_path, get_host_id, write_json_atomic, apply_host_profile, set_torch_threads
+from .embeddings import EmbeddingManager
+from .utils import get_pdf_files, parallel_extract_text_from_pdfs, split_text_into_chunks
+
+class PeakMemorySampler:
+    # Track the peak RSS of the process while a trial runs
+    # RSS rarely goes down between trials, so a trial is judged on its increase over
+    # the RSS measured when it starts, not on memory left over by earlier trials
+    def __init__(self, interval: float = None):
+        self.interval = interval or Config.MEMORY_SAMPLE_INTERVAL
+        self.baseline_rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        self.peak_rss_mb = max(self.peak_rss_mb, self._process.memory_info().rss / (1024 * 1024))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    @property
+    def peak_increase_mb(self) -> float:
+        # Peak RSS reached during the trial above its baseline
+        return max(self.peak_rss_mb - self.baseline_rss_mb, 0.0)
+
+    def __enter__(self) -> "PeakMemorySampler":
+        self._sample()
+        self.baseline_rss_mb = self.peak_rss_mb
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+def tune_host(input_directory: str, memory_limit_mb: float = None, seed: int = 0) -> Optional[dict]:
+    # Run short trials on a sample of the corpus and save the fastest settings fitting in memory
+    # Extraction and embedding are tuned separately, they do not share any setting
+    # Returns the saved profile, None if no PDF or no setting fits in memory
+    if not memory_limit_mb:
+        memory_limit_mb = Config.MEMORY_LIMIT_MB or psutil.virtual_memory().available / (1024 * 1024) * 0.8
+
+    pdf_files = get_pdf_files(input_directory)
+    if not pdf_files:
+        print("No PDF files found in the input directory!")
+        return None
+    sample = random.Random(seed).sample(pdf_files, min(Config.TUNE_SAMPLE_PDFS, len(pdf_files)))
+
+    # Extraction trials, without page cache so parsing is measured
+    # A first pass warms the OS file cache so all trials read from memory
+    # A setting fits if the RSS before the trials plus the trial's increase stays under the limit
+    process = psutil.Process()
+    extraction_trials = []
+    pages = parallel_extract_text_from_pdfs(sample, max_workers=1)
+    extraction_base_mb = process.memory_info().rss / (1024 * 1024)
+    for workers in Config.TUNE_PDF_WORKERS:
+        with PeakMemorySampler() as sampler:
+            start = time.perf_counter()
+            pages = parallel_extract_text_from_pdfs(sample, max_workers=workers)
+            elapsed = time.perf_counter() - start
+        extraction_trials.append({
+            "MAX_WORKERS_PDF": workers,
+            "pages_per_second": len(pages) / elapsed if elapsed > 0 else 0.0,
+            "memory_increase_mb": sampler.peak_increase_mb
+        })
+
+    chunks = [chunk for text, _, _ in pages for chunk in split_text_into_chunks(text)]
+    chunks = chunks[:Config.TUNE_SAMPLE_CHUNKS]
+    if not chunks:
+        print("Sample PDFs contain no extractable text!")
+        return None
+
+    # Embedding trials over the grid of batch sizes, workers and threads
+    embedding_manager = EmbeddingManager()
+    embedding_manager.generate_embeddings(chunks[:Config.EMBEDDING_BATCH_SIZE])  # Warm up the model
+    embedding_base_mb = process.memory_info().rss / (1024 * 1024)
+    embedding_trials = []
+    grid = list(itertools.product(Config.TUNE_BATCH_SIZES, Config.TUNE_EMBEDDING_WORKERS, Config.TUNE_TORCH_THREADS))
+    for batch_size, workers, threads in tqdm(grid, desc="Tuning embeddings", unit="trials"):
+        set_torch_threads(threads)
+        embedding_manager.batch_size = batch_size
+        with PeakMemorySampler() as sampler:
+            start = time.perf_counter()
+            embedding_manager.generate_embeddings(chunks, max_workers=workers)
+            elapsed = time.perf_counter() - start
+        embedding_trials.append({
+            "EMBEDDING_BATCH_SIZE": batch_size,
+            "MAX_WORKERS_EMBEDDINGS": workers,
+            "TORCH_THREADS": threads,
+            "chunks_per_second": len(chunks) / elapsed if elapsed > 0 else 0.0,
+            "memory_increase_mb": sampler.peak_increase_mb
+        })
+
+    fitting_extraction = [t for t in extraction_trials
+                          if extraction_base_mb + t["memory_increase_mb"] <= memory_limit_mb]
+    fitting_embedding = [t for t in embedding_trials
+                         if embedding_base_mb + t["memory_increase_mb"] <= memory_limit_mb]
+    if not fitting_extraction or not fitting_embedding:
+        print(f"No tested setting stays under {memory_limit_mb:.0f} MB, profile not saved.")
+        return None
+    best_extraction = max(fitting_extraction, key=lambda t: t["pages_per_second"])
+    best_embedding = max(fitting_embedding, key=lambda t: t["chunks_per_second"])
+
+    profile = {
+        "host": get_host_id(),
+        "model_name": Config.MODEL_NAME,
+        "tuned_at": time.time(),
+        "memory_limit_mb": memory_limit_mb,
+        "extraction_base_mb": extraction_base_mb,
+        "embedding_base_mb": embedding_base_mb,
+        "sample_pdfs": len(sample),
+        "sample_chunks": len(chunks),
+        "settings": {
+            "MAX_WORKERS_PDF": best_extraction["MAX_WORKERS_PDF"],
+            "EMBEDDING_BATCH_SIZE": best_embedding["EMBEDDING_BATCH_SIZE"],
+            "MAX_WORKERS_EMBEDDINGS": best_embedding["MAX_WORKERS_EMBEDDINGS"],
+            "TORCH_THREADS": best_embedding["TORCH_THREADS"]
+        },
+        "extraction_trials": extraction_trials,
+        "embedding_trials": embedding_trials
+    }
+    write_json_atomic(host_profile_path("tuning"), profile)
+    apply_host_profile()
+
+    print("\n=== Tuning Results ===")
+    for name, value in profile["settings"].items():
+        print(f"{name}: {value}")
+    print(f"Extraction: {best_extraction['pages_per_second']:.2f} pages/second")
+    print(f"Embedding: {best_embedding['chunks_per_second']:.2f} chunks/second")
+    print(f"Profile saved for host {profile['host']}")
+    return profile
+
+def run_tuning() -> None:
+    # Interactive entry point of the tuning command
+    input_directory = input("Enter directory with sample PDF files: ")
+    limit = input("Memory limit in MB (empty = Config or 80% of available): ")
+    try:
+        memory_limit_mb = float(limit) if limit else None
+    except ValueError:
+        print("Invalid memory limit!")
+        return
+    try:
+        tune_host(input_directory, memory_limit_mb)
+    except Exception as e:
+        print(f"Error during tuning: {str(e)}")
@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import socket
+import threading
+import concurrent.futures
+import fitz  # PyMuPDF
+from dataclasses import dataclass, asdict, fields
+from typing import List, Dict, Tuple, Optional
+from config import Config
+
+
+########################################
+# Host identification and profile path #
+########################################
+
+
+def get_host_id() -> str:
+    # Identify the current machine, used to keep one calibration per host
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', socket.gethostname()) or "localhost"
+
+def host_profile_path(kind: str) -> str:
+    # Path of a per-host profile file, e.g. "myhost.cost_model.json"
+    return os.path.join(Config.HOST_PROFILE_ROOT, f"{get_host_id()}.{kind}.json")
+
+def write_json_atomic(path: str, data) -> None:
+    # Write JSON to a temp file then rename it, so readers never see a partial file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+#############################
+# Tuned host profile        #
+#############################
+
+
+TUNED_SETTINGS = ("MAX_WORKERS_PDF", "EMBEDDING_BATCH_SIZE", "MAX_WORKERS_EMBEDDINGS", "TORCH_THREADS")
+_default_torch_threads = None  # Thread count of the backend before any tuning
+
+def set_torch_threads(threads: int) -> None:
+    # Set intra-op threads of the embedding backend, 0 restores the library default
+    global _default_torch_threads
+    try:
+        import torch
+    except ImportError:
+        return
+    if _default_torch_threads is None:
+        _default_torch_threads = torch.get_num_threads()
+    torch.set_num_threads(threads if threads > 0 else _default_torch_threads)
+
+def apply_host_profile(path: str = None) -> bool:
+    # Load the tuned settings of this host into Config, returns True if a profile was applied
+    # Profiles tuned for another model are ignored, batch size depends on the model
+    path = path or host_profile_path("tuning")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profile = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    if profile.get("model_name") != Config.MODEL_NAME:
+        if Config.VERBOSE:
+            print(f"Host profile tuned for {profile.get('model_name')}, not applied to {Config.MODEL_NAME}")
+        return False
+
+    for name in TUNED_SETTINGS:
+        if name in profile["settings"]:
+            setattr(Config, name, profile["settings"][name])
+    set_torch_threads(Config.TORCH_THREADS)
+    return True
+
+
+#############################
+# Parallel page counting    #
+#############################
+
+
+class PageCountCache:
+    # Cache of page counts keyed by PDF path, invalidated when size or mtime change
+    def __init__(self, path: str = None):
+        self.path = path or Config.PAGE_COUNT_CACHE_PATH
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def get(self, pdf_path: str, stat: os.stat_result) -> Optional[int]:
+        # Return cached page count if the file did not change
+        entry = self.entries.get(os.path.abspath(pdf_path))
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["pages"]
+        return None
+
+    def set(self, pdf_path: str, stat: os.stat_result, pages: int) -> None:
+        # Store page count of a file
+        self.entries[os.path.abspath(pdf_path)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "pages": pages
+        }
+        self.dirty = True
+
+    def save(self) -> None:
+        # Persist cache to disk if modified
+        if self.dirty:
+            write_json_atomic(self.path, self.entries)
+            self.dirty = False
+
+def _count_pdf_pages(pdf_path: str) -> int:
+    # Count pages of a single PDF, 0 if it cannot be opened
+    try:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    except Exception as e:
+        print(f"Error counting pages of {pdf_path}: {str(e)}")
+        return 0
+
+def count_pages(pdf_files: List[str],
+                max_workers: int = None,
+                cache: PageCountCache = None) -> Dict[str, int]:
+    # Count pages of all PDFs, reusing cached counts and opening the others in parallel
+    # Processes are used rather than threads since PyMuPDF holds the GIL while parsing
+    cache = cache or PageCountCache()
+    page_counts = {}
+    to_count = []
+    for pdf_path in pdf_files:
+        try:
+            stat = os.stat(pdf_path)
+        except OSError as e:
+            print(f"Error reading {pdf_path}: {str(e)}")
+            continue
+        cached = cache.get(pdf_path, stat)
+        if cached is None:
+            to_count.append((pdf_path, stat))
+        else:
+            page_counts[pdf_path] = cached
+
+    if to_count:
+        max_workers = max_workers or Config.MAX_WORKERS_PAGE_COUNT
+        paths = [pdf_path for pdf_path, _ in to_count]
+        chunksize = max(1, len(paths) // (max_workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for (pdf_path, stat), pages in zip(to_count, executor.map(_count_pdf_pages, paths, chunksize=chunksize)):
+                page_counts[pdf_path] = pages
+                if pages:
+                    cache.set(pdf_path, stat, pages)
+        cache.save()
+
+    return page_counts
+
+
+#############################
+# Per-stage cost model      #
+#############################
+
+
+@dataclass
+class CostModel:
+    # Calibrated cost of each ingestion stage on this host
+    extraction_seconds_per_page: float    # fitz text extraction
+    chunking_seconds_per_page: float      # split_text_into_chunks
+    embedding_seconds_per_token: float    # Embedding generation (tokens = whitespace separated words)
+    index_add_seconds_per_vector: float   # Adding a vector to the FAISS index
+    tokens_per_page: float                # Average tokens extracted from a page
+    chunks_per_page: float                # Average chunks produced from a page
+    base_memory_mb: float                 # Fixed memory cost (model, runtime)
+    mb_per_page: float                    # Memory retained per page (extracted text and chunks)
+    mb_per_vector: float                  # Memory per embedding vector and its metadata
+    host: str = ""
+    model_name: str = ""
+    calibrated_at: float = 0.0
+
+    @classmethod
+    def default(cls) -> "CostModel":
+        # Uncalibrated model matching the Config defaults
+        return cls(
+            extraction_seconds_per_page=1.0 / Config.DEFAULT_PAGES_PER_SECOND,
+            chunking_seconds_per_page=0.0,
+            embedding_seconds_per_token=0.0,
+            index_add_seconds_per_vector=0.0,
+            tokens_per_page=0.0,
+            chunks_per_page=0.0,
+            base_memory_mb=0.0,
+            mb_per_page=Config.DEFAULT_MB_PER_PAGE,
+            mb_per_vector=0.0,
+            host=get_host_id(),
+            model_name=Config.MODEL_NAME
+        )
+
+    @classmethod
+    def load(cls, path: str = None) -> "CostModel":
+        # Load the calibration of this host, default model if none was saved
+        # Calibrations measured with another model are ignored, embedding cost depends on the model
+        path = path or host_profile_path("cost_model")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            known = {field.name for field in fields(cls)}
+            cost_model = cls(**{key: value for key, value in data.items() if key in known})
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return cls.default()
+        if cost_model.model_name != Config.MODEL_NAME:
+            if Config.VERBOSE:
+                print(f"Cost model calibrated for {cost_model.model_name}, not used for {Config.MODEL_NAME}")
+            return cls.default()
+        return cost_model
+
+    def save(self, path: str = None) -> None:
+        # Save the calibration of this host
+        write_json_atomic(path or host_profile_path("cost_model"), asdict(self))
+
+    @property
+    def seconds_per_page(self) -> float:
+        # Overall processing cost of one page, all stages included
+        return (self.extraction_seconds_per_page
+                + self.chunking_seconds_per_page
+                + self.tokens_per_page * self.embedding_seconds_per_token
+                + self.chunks_per_page * self.index_add_seconds_per_vector)
+
+    def estimate(self, total_pages: int) -> Tuple[float, float]:
+        # Estimate (minutes, peak memory in GB) to process a number of pages
+        estimated_minutes = total_pages * self.seconds_per_page / 60
+        estimated_memory_mb = (self.base_memory_mb
+                               + total_pages * self.mb_per_page
+                               + total_pages * self.chunks_per_page * self.mb_per_vector)
+        return estimated_minutes, estimated_memory_mb / 1024
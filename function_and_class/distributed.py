@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+import concurrent.futures
+from dataclasses import replace
+from typing import List, Dict
+from tqdm import tqdm
+from config import Config
+from .metadata import MetadataManager
+from .embeddings import EmbeddingManager
+from .faiss_index import FAISSIndex
+from .snapshots import SnapshotManager
+from .utils import PDFVectorDatabase, get_pdf_files, database_registry
+
+
+##################################
+# Sharding of the PDF file list  #
+##################################
+
+
+def shard_db_name(db_name: str, shard_index: int, num_shards: int) -> str:
+    # Name of the partial database built for one shard
+    return f"{db_name}.shard-{shard_index:03d}-of-{num_shards:03d}"
+
+def shard_of(pdf_path: str, input_directory: str, num_shards: int) -> int:
+    # Shard of a PDF, stable across nodes as long as paths relative to the input directory match
+    relative_path = os.path.relpath(pdf_path, input_directory).replace(os.sep, '/')
+    digest = hashlib.sha1(relative_path.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+def shard_pdf_files(pdf_files: List[str], input_directory: str, num_shards: int, shard_index: int) -> List[str]:
+    # PDFs assigned to one shard, in a deterministic order
+    return sorted(pdf_path for pdf_path in pdf_files
+                  if shard_of(pdf_path, input_directory, num_shards) == shard_index)
+
+def find_shards(db_name: str) -> List[str]:
+    # List the partial databases built for a database, in shard order
+    # Raises ValueError if shards are missing or come from builds with different shard counts
+    pattern = re.compile(rf"^{re.escape(db_name)}\.shard-(\d+)-of-(\d+)$")
+    if not os.path.isdir(Config.DATABASE_ROOT):
+        return []
+    matches = [pattern.match(d) for d in sorted(os.listdir(Config.DATABASE_ROOT))]
+    matches = [m for m in matches if m]
+    if not matches:
+        return []
+
+    counts = {int(m.group(2)) for m in matches}
+    if len(counts) > 1:
+        raise ValueError(f"Shards of {db_name} come from builds with different shard counts: {sorted(counts)}")
+    num_shards = counts.pop()
+    found = {int(m.group(1)) for m in matches}
+    missing = sorted(set(range(num_shards)) - found)
+    if missing:
+        raise ValueError(f"Missing shards of {db_name}: {missing}")
+    return [m.group(0) for m in matches]
+
+
+##################################
+# Partial database build         #
+##################################
+
+
+def build_shard(input_directory: str,
+                db_name: str,
+                num_shards: int,
+                shard_index: int,
+                skip_dedup: bool = True) -> str:
+    # Build the partial database of one shard, meant to run on a worker node or process
+    # Shards are not reduced: each would learn its own PCA, the merge learns one for the whole database
+    # Returns the name of the partial database
+    pdf_files = shard_pdf_files(get_pdf_files(input_directory), input_directory, num_shards, shard_index)
+    name = shard_db_name(db_name, shard_index, num_shards)
+    print(f"\nBuilding {name} from {len(pdf_files)} PDF files...")
+
+    db = PDFVectorDatabase(input_directory)
+    db.process_pdfs(skip_dedup=skip_dedup, db_name=name, pdf_files=pdf_files, reduce=False, manifest={
+        "shard": {"db_name": db_name, "index": shard_index, "count": num_shards, "pdf_files": len(pdf_files)}
+    })
+    return name
+
+def build_shards_locally(input_directory: str,
+                         db_name: str,
+                         num_shards: int = Config.SHARD_COUNT,
+                         max_workers: int = Config.MAX_WORKERS_SHARDS,
+                         skip_dedup: bool = True) -> List[str]:
+    # Build all shards on this machine, one process per shard
+    shard_names = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(build_shard, input_directory, db_name, num_shards, i, skip_dedup): i
+                   for i in range(num_shards)}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                shard_names.append(future.result())
+            except Exception as e:
+                print(f"Error building shard {futures[future]}: {str(e)}")
+    return sorted(shard_names)
+
+
+##################################
+# Merge of partial databases     #
+##################################
+
+
+def merge_databases(shard_names: List[str], output_name: str, dedup: bool = False) -> str:
+    # Merge partial databases into one database and publish it
+    # Chunk ids of each shard are shifted after the ids of the previous shards,
+    # the manifest records where each range of ids comes from.
+    # With dedup, vectors duplicating an already merged vector become aliases of its chunk.
+    # Shards without reduction are reduced per Config, with one reduction learned from the first shard
+    # (shards are hash samples of the corpus). Reduced shards are copied as stored, which is only
+    # possible if they share the same trained reduction: re-projecting vectors reduced by another
+    # PCA would lose most of their information, so such shards are refused.
+    # Returns the published version
+    merged_index = None
+    merged_metadata = MetadataManager()
+    provenance = []
+    next_id = 0
+    total_duplicates = 0
+
+    for shard_name in shard_names:
+        snapshots = SnapshotManager(shard_name)
+        version = snapshots.current_version()
+        index_path, metadata_path = snapshots.resolve_paths(version)
+
+        shard_metadata = MetadataManager()
+        shard_metadata.load_metadata(metadata_path)
+        shard_index = FAISSIndex.from_file(index_path)
+        if merged_index is None:
+            if shard_index.reduction_method:
+                merged_index = shard_index.empty_copy()
+            else:
+                merged_index = FAISSIndex(shard_index.dimension, Config.REDUCTION_METHOD, Config.REDUCTION_DIM)
+                if not merged_index.is_trained:
+                    _, sample = next(shard_index.iter_vectors(block_size=Config.REDUCTION_TRAIN_SIZE), (None, None))
+                    if sample is not None:
+                        merged_index.train(sample)
+        elif shard_index.dimension != merged_index.dimension:
+            raise ValueError(f"{shard_name} has dimension {shard_index.dimension}, expected {merged_index.dimension}")
+
+        # Reduced shards are copied as stored, full vectors go through the merged reduction
+        stored = shard_index.reduction_method is not None
+        if stored and shard_index.projection_state() != merged_index.projection_state():
+            raise ValueError(f"{shard_name} was reduced with another trained {shard_index.reduction_method}, "
+                             f"rebuild shards without reduction to merge them")
+        add = merged_index.add_stored_vectors if stored else merged_index.add_vectors
+
+        offset = next_id
+        redirects: Dict[int, int] = {}  # Shifted id of a dropped vector -> id of the chunk it duplicates
+        vector_blocks = shard_index.iter_vectors()
+        for ids, vectors in tqdm(vector_blocks, desc=f"Merging {shard_name}", unit="blocks"):
+            ids = ids + offset
+            if dedup:
+                vectors, unique_indices, duplicates = EmbeddingManager.deduplicate_against_index(
+                    vectors, ids, merged_index, stored=stored)
+                redirects.update({int(ids[position]): chunk_id for position, chunk_id in duplicates.items()})
+                ids = ids[unique_indices]
+            add(vectors, ids)
+
+        # Shift chunk ids and point aliases of dropped vectors to the surviving chunk
+        max_id = -1
+        for chunk in shard_metadata.all_chunks():
+            chunk_id = chunk.chunk_id + offset
+            alias_of = None if chunk.alias_of is None else chunk.alias_of + offset
+            alias_of = redirects.get(alias_of, alias_of)
+            if chunk_id in redirects:
+                alias_of = redirects[chunk_id]
+            merged_metadata.add_chunk(replace(chunk, chunk_id=chunk_id, alias_of=alias_of))
+            max_id = max(max_id, chunk_id)
+
+        next_id = max(next_id, max_id + 1)
+        total_duplicates += len(redirects)
+        provenance.append({
+            "db_name": shard_name,
+            "version": version,
+            "chunk_id_offset": offset,
+            "chunks": next_id - offset,
+            "duplicates": len(redirects)
+        })
+
+    if merged_index is None:
+        raise ValueError("No shard to merge")
+
+    print(f"Merged {len(shard_names)} shards: {merged_index.index.ntotal} vectors, "
+          f"{next_id} chunks, {total_duplicates} cross-shard duplicates")
+    return SnapshotManager(output_name).publish(merged_index, merged_metadata, {
+        "merged_from": provenance,
+        "merged_at": time.time(),
+        "cross_shard_dedup": dedup
+    })
+
+
+def build_distributed_database():
+    # Interactive local build: shard the PDF list, build shards in parallel processes, then merge
+    db_name = input("Enter new database name: ")
+    input_directory = input("Enter directory with PDF files you want to process: ")
+    try:
+        num_shards = int(input(f"Number of shards ({Config.SHARD_COUNT}): ") or Config.SHARD_COUNT)
+    except ValueError:
+        print("Invalid number of shards!")
+        return None
+    dedup = input("\nDo you want to deduplicate across shards? (y/N): ").lower() == 'y'
+
+    try:
+        shard_names = build_shards_locally(input_directory, db_name, num_shards)
+        if len(shard_names) != num_shards:
+            print("Some shards failed, merge cancelled.")
+            return None
+        merge_databases(shard_names, db_name, dedup)
+    except Exception as e:
+        print(f"Error during distributed build: {str(e)}")
+        return None
+
+    return database_registry.get(db_name)
+
+
+##################################
+# Command line for worker nodes  #
+##################################
+
+
+def main():
+    # Entry point for non interactive use, e.g. on worker nodes:
+    #     python -m function_and_class.distributed build --input DIR --db NAME --shard 0 --num-shards 4
+    #     python -m function_and_class.distributed merge --db NAME [--dedup]
+    #     python -m function_and_class.distributed local --input DIR --db NAME --num-shards 4
+    parser = argparse.ArgumentParser(description="Distributed database build")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build the partial database of one shard")
+    build_parser.add_argument("--input", required=True, help="Directory with PDF files")
+    build_parser.add_argument("--db", required=True, help="Database name")
+    build_parser.add_argument("--shard", type=int, required=True, help="Shard index (0-based)")
+    build_parser.add_argument("--num-shards", type=int, default=Config.SHARD_COUNT)
+    build_parser.add_argument("--dedup", action="store_true", help="Deduplicate vectors within the shard")
+
+    merge_parser = subparsers.add_parser("merge", help="Merge partial databases")
+    merge_parser.add_argument("--db", required=True, help="Database name")
+    merge_parser.add_argument("--dedup", action="store_true", help="Deduplicate vectors across shards")
+
+    local_parser = subparsers.add_parser("local", help="Build all shards here, then merge them")
+    local_parser.add_argument("--input", required=True, help="Directory with PDF files")
+    local_parser.add_argument("--db", required=True, help="Database name")
+    local_parser.add_argument("--num-shards", type=int, default=Config.SHARD_COUNT)
+    local_parser.add_argument("--workers", type=int, default=Config.MAX_WORKERS_SHARDS)
+    local_parser.add_argument("--dedup", action="store_true", help="Deduplicate vectors across shards")
+
+    args = parser.parse_args()
+    match args.command:
+        case "build":
+            build_shard(args.input, args.db, args.num_shards, args.shard, skip_dedup=not args.dedup)
+        case "merge":
+            merge_databases(find_shards(args.db), args.db, args.dedup)
+        case "local":
+            shard_names = build_shards_locally(args.input, args.db, args.num_shards, args.workers)
+            if len(shard_names) != args.num_shards:
+                sys.exit(f"{args.num_shards - len(shard_names)} shards failed, merge cancelled.")
+            merge_databases(shard_names, args.db, args.dedup)
+
+if __name__ == "__main__":
+    main()
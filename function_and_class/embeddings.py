@@ -1,19 +1,49 @@
+import os
+import tempfile
 import numpy as np
 import concurrent.futures
-from typing import List, Tuple, Dict
+import faiss
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Sequence, Iterator
 from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 from config import Config
+from .faiss_index import FAISSIndex
+from .memory_governor import MemoryGovernor
+from .registry import get_shared_model
+
+@contextmanager
+def embedding_matrix(rows: int, dimension: int, disk_backed: bool = False) -> Iterator[np.ndarray]:
+    # Preallocated float32 matrix for the embeddings of a corpus
+    # Above Config.EMBEDDING_MEMMAP_THRESHOLD_MB, or always with disk_backed, it is a memmap in a
+    # scratch file, so the OS can page written rows out instead of keeping a second copy of the vectors in RAM.
+    # The FAISS index is in memory, so the vectors added to it must still fit in RAM.
+    # The scratch file is deleted on exit.
+    size_mb = rows * dimension * 4 / (1024 * 1024)
+    if not disk_backed and size_mb <= Config.EMBEDDING_MEMMAP_THRESHOLD_MB:
+        yield np.empty((rows, dimension), dtype='float32')
+        return
+
+    os.makedirs(Config.EMBEDDING_SCRATCH_ROOT, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".npy", dir=Config.EMBEDDING_SCRATCH_ROOT)
+    os.close(fd)
+    matrix = None
+    try:
+        matrix = np.lib.format.open_memmap(path, mode='w+', dtype='float32', shape=(rows, dimension))
+        yield matrix
+    finally:
+        del matrix
+        os.remove(path)
 
 class EmbeddingManager:
     def __init__(self, 
                  model_name: str = Config.MODEL_NAME, 
-                 batch_size: int = Config.EMBEDDING_BATCH_SIZE):
+                 batch_size: int = None):
         #Initialize the embedding manager with a model and batch size
-        self.model = SentenceTransformer(model_name)
+        # The model is shared with every other manager of the process using it
+        self.model = get_shared_model(model_name)
         self.embeddings: Dict[str, np.ndarray] = {}
-        self.batch_size = batch_size
+        self.batch_size = batch_size or Config.EMBEDDING_BATCH_SIZE
 
     def generate_embeddings_batch(self, text_chunks: List[str]) -> np.ndarray:
         #Generate embeddings for a batch of text chunks
@@ -21,30 +51,45 @@ class EmbeddingManager:
 
     def generate_embeddings(self, 
                           text_chunks: List[str], 
-                          max_workers: int = Config.MAX_WORKERS_EMBEDDINGS) -> np.ndarray:
-        
-        # Split chunks into batches
-        batches = [text_chunks[i:i + self.batch_size] 
-                  for i in range(0, len(text_chunks), self.batch_size)]
-        
-        all_embeddings = []
+                          max_workers: int = None,
+                          governor: MemoryGovernor = None,
+                          out: np.ndarray = None) -> np.ndarray:
+        # Generate embeddings for text chunks in parallel batches, in the order of the chunks
+        # With a governor, batch size and number of batches in flight follow memory pressure
+        # Each batch is written in its rows of `out` as it completes, allocated here if not given
+        # (e.g. a slice of a preallocated embedding matrix)
+        max_workers = max_workers or Config.MAX_WORKERS_EMBEDDINGS
+        if out is None:
+            out = np.empty((len(text_chunks), self.model.get_sentence_embedding_dimension()), dtype='float32')
+        if not text_chunks:
+            return out
+
+        # Batches are cut as they are submitted, so batch size can change on the way
+        futures = {}
+        next_start = 0
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(self.generate_embeddings_batch, batch): i 
-                      for i, batch in enumerate(batches)}
-            
-            with tqdm(total=len(batches), desc="Generating embeddings") as pbar:
-                for future in concurrent.futures.as_completed(futures):
-                    batch_idx = futures[future]
-                    try:
-                        embeddings = future.result()
-                        all_embeddings.append((batch_idx, embeddings))
-                    except Exception as e:
-                        print(f"Error processing batch {batch_idx}: {str(e)}")
-                    pbar.update(1)
+            with tqdm(total=len(text_chunks), desc="Generating embeddings", unit="chunks") as pbar:
+                while next_start < len(text_chunks) or futures:
+                    in_flight = governor.embedding_workers if governor else max_workers
+                    batch_size = governor.embedding_batch_size if governor else self.batch_size
+                    while next_start < len(text_chunks) and len(futures) < in_flight:
+                        batch = text_chunks[next_start:next_start + batch_size]
+                        futures[executor.submit(self.generate_embeddings_batch, batch)] = (next_start, batch)
+                        next_start += len(batch)
+
+                    done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        batch_start, batch = futures.pop(future)
+                        try:
+                            embeddings = future.result()
+                        except Exception as e:
+                            # Retry once, a missing batch would shift every following vector
+                            print(f"Error processing batch at chunk {batch_start}: {str(e)}, retrying")
+                            embeddings = self.generate_embeddings_batch(batch)
+                        out[batch_start:batch_start + len(batch)] = embeddings
+                        pbar.update(len(batch))
         
-        # Reorder results to match original sequence
-        all_embeddings.sort(key=lambda x: x[0])
-        return np.vstack([emb for _, emb in all_embeddings])
+        return out
 
     def deduplicate_vectors(self, 
                           new_embeddings: np.ndarray, 
@@ -75,4 +120,51 @@ class EmbeddingManager:
                 
                 pbar.update(1)
 
-        return np.array(unique_embeddings), unique_indices
\ No newline at end of file
+        return np.array(unique_embeddings), unique_indices
+
+    @staticmethod
+    def deduplicate_against_index(new_embeddings: np.ndarray,
+                                  new_ids: Sequence[int],
+                                  faiss_index: FAISSIndex,
+                                  threshold: float = Config.DEDUP_THRESHOLD,
+                                  stored: bool = False) -> Tuple[np.ndarray, List[int], Dict[int, int]]:
+        # Deduplicate vectors about to be inserted, against the existing index and against each other
+        # Cost depends on the number of new vectors only, the existing index is queried, not rebuilt
+        # With stored, new vectors are already reduced by the index's reduction (see add_stored_vectors)
+        # Returns (unique embeddings, their positions, {position of duplicate: chunk id it duplicates})
+        if len(new_embeddings) == 0:
+            return np.array([]), [], {}
+
+        new_embeddings = np.asarray(new_embeddings, dtype='float32')
+        duplicates = {}
+
+        # Nearest existing vector of each new vector, in one batched query
+        # Embeddings are normalized, so cosine similarity = 1 - squared L2 distance / 2
+        if faiss_index is not None and faiss_index.index.ntotal > 0:
+            if stored:
+                distances, ids = faiss_index.search_stored(new_embeddings, 1)
+            else:
+                distances, ids = faiss_index.search(new_embeddings, 1)
+            for i, (distance, chunk_id) in enumerate(zip(distances[:, 0], ids[:, 0])):
+                if chunk_id >= 0 and 1 - distance / 2 > threshold:
+                    duplicates[i] = int(chunk_id)
+
+        # Compare remaining vectors with the ones accepted so far in this batch
+        batch_index = faiss.IndexFlatL2(new_embeddings.shape[1])
+        unique_indices = []
+        with tqdm(total=len(new_embeddings),
+                  desc="Deduplicating against index",
+                  unit="vectors") as pbar:
+            for i in range(len(new_embeddings)):
+                if i not in duplicates:
+                    current_vector = new_embeddings[i:i + 1]
+                    if batch_index.ntotal > 0:
+                        distances, positions = batch_index.search(current_vector, 1)
+                        if 1 - distances[0, 0] / 2 > threshold:
+                            duplicates[i] = int(new_ids[unique_indices[positions[0, 0]]])
+                    if i not in duplicates:
+                        batch_index.add(current_vector)
+                        unique_indices.append(i)
+                pbar.update(1)
+
+        return new_embeddings[unique_indices], unique_indices, duplicates
@@ -1,34 +1,189 @@
 import faiss
 import numpy as np
-from typing import Tuple
+from typing import Generator, List, Optional, Tuple
+from config import Config
+
+REDUCTION_METHODS = ("pca", "truncate")
+
+def build_reduction_chain(method: str, input_dim: int, output_dim: int) -> List[faiss.VectorTransform]:
+    # Transforms applied before indexing: a projection to output_dim, then L2 normalization
+    # so that similarity scores keep their meaning (1 - squared L2 distance / 2)
+    # - "pca": projection on the principal components, learned from a sample of embeddings
+    # - "truncate": keep the first output_dim components, for models trained to support it
+    if output_dim >= input_dim:
+        raise ValueError(f"Reduced dimension {output_dim} must be lower than {input_dim}")
+
+    match method:
+        case "pca":
+            projection = faiss.PCAMatrix(input_dim, output_dim)
+        case "truncate":
+            # A dimension map rather than a matrix: filling LinearTransform.A from numpy fails
+            # once PyMuPDF is imported, its SWIG wrapper of std::vector<float> replaces faiss' one
+            projection = faiss.RemapDimensionsTransform(input_dim, output_dim, False)
+        case _:
+            raise ValueError(f"Unknown reduction method {method}, expected one of {REDUCTION_METHODS}")
+
+    return [projection, faiss.NormalizationTransform(output_dim)]
+
+def serialize_transform(transform: faiss.VectorTransform) -> np.ndarray:
+    # Bytes of a single trained transform, without any index around it
+    writer = faiss.VectorIOWriter()
+    faiss.write_VectorTransform(transform, writer)
+    return faiss.vector_to_array(writer.data)
+
+def deserialize_transform(data: np.ndarray) -> faiss.VectorTransform:
+    # Transform read back from serialize_transform bytes
+    reader = faiss.VectorIOReader()
+    faiss.copy_array_to_vector(data, reader.data)
+    return faiss.read_VectorTransform(reader)
 
 class FAISSIndex:
-    def __init__(self, dimension: int):
+    def __init__(self, dimension: int, reduction_method: str = None, reduction_dim: int = None):
         # Initialize FAISS index with specified dimension
+        # Vectors are stored with their chunk id, so chunks without vector (duplicates) are allowed
+        # With a reduction method, vectors and queries are projected to reduction_dim before indexing,
+        # the projection is saved in the same file as the index
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
+        self.stored_dimension = reduction_dim if reduction_method else dimension
+        self.reduction_method = reduction_method
+        self.id_map = faiss.IndexIDMap(faiss.IndexFlatL2(self.stored_dimension))
+        self.index = self.id_map
+        if reduction_method:
+            self.index = faiss.IndexPreTransform(self.id_map)
+            for transform in reversed(build_reduction_chain(reduction_method, dimension, reduction_dim)):
+                self.index.prepend_transform(transform)
+
+    @property
+    def transforms(self) -> List[faiss.VectorTransform]:
+        # Transforms applied before indexing, empty without reduction
+        if not isinstance(self.index, faiss.IndexPreTransform):
+            return []
+        return [faiss.downcast_VectorTransform(self.index.chain.at(i)) for i in range(self.index.chain.size())]
+
+    @property
+    def is_trained(self) -> bool:
+        # False until the reduction has been learned
+        return self.index.is_trained
+
+    def train(self, vectors: np.ndarray) -> None:
+        # Learn the reduction from a sample of embeddings
+        # PCA needs at least as many vectors as reduced dimensions, small databases fall back to truncation
+        sample = vectors[:Config.REDUCTION_TRAIN_SIZE].astype('float32')
+        if self.reduction_method == "pca" and len(sample) < self.stored_dimension:
+            print(f"Warning: {len(sample)} vectors are too few to learn a PCA "
+                  f"to {self.stored_dimension} dimensions, using truncation instead")
+            self._set_index(FAISSIndex(self.dimension, "truncate", self.stored_dimension).index)
+            return
+        self.index.train(sample)
 
-    def add_vectors(self, vectors: np.ndarray) -> None:
+    def add_vectors(self, vectors: np.ndarray, ids: np.ndarray = None) -> None:
         # Add vectors to FAISS index if not empty
-        # Converts to float32 for compatibility
+        # Converts to float32 for compatibility, float32 vectors are added without a copy
+        # Ids default to consecutive numbers after the vectors already stored
+        # An untrained reduction is learned from the first vectors added
         if len(vectors) > 0:
-            self.index.add(vectors.astype('float32'))
+            if not self.is_trained:
+                self.train(vectors)
+            if ids is None:
+                ids = np.arange(self.index.ntotal, self.index.ntotal + len(vectors))
+            self.index.add_with_ids(vectors.astype('float32', copy=False), np.asarray(ids, dtype='int64'))
+
+    def add_stored_vectors(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        # Add vectors already reduced by this index's trained reduction, e.g. read from iter_vectors()
+        # They bypass the reduction and are stored as they are
+        self.id_map.add_with_ids(np.asarray(vectors, dtype='float32'), np.asarray(ids, dtype='int64'))
+        self.index.ntotal = self.id_map.ntotal
+
+    def iter_vectors(self,
+                     block_size: int = None,
+                     input_space: bool = False) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+        # Stream stored (chunk ids, vectors) in blocks, to copy an index without loading it twice
+        # With input_space, reduced vectors are projected back to the embedding dimension,
+        # which is exact for truncation and drops the discarded components for PCA
+        block_size = block_size or Config.INDEX_BLOCK_SIZE
+        ids = faiss.vector_to_array(self.id_map.id_map)
+        transforms = self.transforms if input_space else []
+        for start in range(0, self.id_map.ntotal, block_size):
+            count = min(block_size, self.id_map.ntotal - start)
+            vectors = self.id_map.index.reconstruct_n(start, count)
+            for transform in reversed(transforms):
+                vectors = transform.reverse_transform(vectors)
+            yield ids[start:start + count], vectors
+
+    def copy(self) -> "FAISSIndex":
+        # Independent index with the same vectors and the same trained reduction
+        faiss_index = FAISSIndex(self.dimension)
+        faiss_index._set_index(faiss.deserialize_index(faiss.serialize_index(self.index)))
+        return faiss_index
+
+    def projection_state(self) -> Optional[bytes]:
+        # Serialized trained projection, equal for indexes sharing the same reduction, None without reduction
+        if not self.reduction_method:
+            return None
+        return serialize_transform(self.transforms[0]).tobytes()
+
+    def empty_copy(self) -> "FAISSIndex":
+        # New empty index with the same dimension and the same trained reduction
+        # Only the projection is copied, stored vectors are never serialized
+        faiss_index = FAISSIndex(self.dimension)
+        if not self.reduction_method:
+            return faiss_index
+        projection = deserialize_transform(serialize_transform(self.transforms[0]))
+        index = faiss.IndexPreTransform(faiss.IndexIDMap(faiss.IndexFlatL2(self.stored_dimension)))
+        index.prepend_transform(faiss.NormalizationTransform(self.stored_dimension))
+        index.prepend_transform(projection)
+        faiss_index._set_index(index)
+        return faiss_index
 
     def save_index(self, path: str) -> None:
         # Save FAISS index to disk at specified path
         faiss.write_index(self.index, path)
 
+    @classmethod
+    def from_file(cls, path: str) -> "FAISSIndex":
+        # Load an index whose dimension is read from the file
+        index = faiss.read_index(path)
+        faiss_index = cls(index.d)
+        faiss_index._set_loaded_index(index)
+        return faiss_index
+
     def load_index(self, path: str) -> None:
         # Load FAISS index from disk
-        self.index = faiss.read_index(path)
+        self._set_loaded_index(faiss.read_index(path))
+
+    def _set_loaded_index(self, index: faiss.Index) -> None:
+        # Use an index read from disk
+        if not isinstance(index, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+            # Index saved without ids: vector positions are the chunk ids
+            vectors = index.reconstruct_n(0, index.ntotal)
+            index = faiss.IndexIDMap(faiss.IndexFlatL2(index.d))
+            index.add_with_ids(vectors, np.arange(len(vectors), dtype='int64'))
+        self._set_index(index)
+
+    def _set_index(self, index: faiss.Index) -> None:
+        # Use a loaded index, reduced or not
+        self.index = index
+        self.dimension = index.d
+        if isinstance(index, faiss.IndexPreTransform):
+            self.id_map = faiss.downcast_index(index.index)
+            projection = self.transforms[0]
+            self.reduction_method = "pca" if isinstance(projection, faiss.PCAMatrix) else "truncate"
+        else:
+            self.id_map = index
+            self.reduction_method = None
+        self.stored_dimension = self.id_map.d
 
     def search(self, 
               query_vector: np.ndarray, 
               k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
         # Search for k nearest neighbors in the index
         # Args:
-        #     query_vector: Vector to search for
+        #     query_vector: Vector to search for, at the embedding dimension
         #     k: Number of nearest neighbors to return
         # Returns:
-        #     Tuple of (distances, indices) arrays
-        return self.index.search(query_vector.astype('float32'), k)
\ No newline at end of file
+        #     Tuple of (distances, chunk ids) arrays, ids are -1 when fewer than k vectors exist
+        return self.index.search(query_vector.astype('float32'), k)
+
+    def search_stored(self, vectors: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        # Search with vectors already reduced by this index's reduction, e.g. read from iter_vectors()
+        return self.id_map.search(np.asarray(vectors, dtype='float32'), k)
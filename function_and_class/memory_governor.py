@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import threading
+import psutil
+from typing import List
+from config import Config
+
+class MemoryGovernor:
+    # Keep ingestion under a memory ceiling by sampling the process RSS in a background thread
+    # Above the high watermark: halve extraction workers, embedding batch size and embedding workers,
+    # and ask the pipeline to flush pending vectors to the index.
+    # While it is enabled, embeddings are written to a disk-backed matrix, whose pages a flush releases.
+    # The index is in memory, so a flush frees the embedding buffers, not the memory of the vectors:
+    # the ceiling must leave room for the whole index.
+    # Below the low watermark: scale back up step by step towards the configured values.
+    # Every adjustment is recorded as a metric and appended to a JSON lines file.
+    def __init__(self, limit_mb: float = None, sample_interval: float = None):
+        self.limit_mb = Config.MEMORY_LIMIT_MB if limit_mb is None else limit_mb
+        self.sample_interval = sample_interval or Config.MEMORY_SAMPLE_INTERVAL
+
+        # Configured values are the ceilings, current values move between 1 and them
+        self.max_pdf_workers = Config.MAX_WORKERS_PDF
+        self.max_embedding_batch_size = Config.EMBEDDING_BATCH_SIZE
+        self.max_embedding_workers = Config.MAX_WORKERS_EMBEDDINGS
+        self.pdf_workers = self.max_pdf_workers
+        self.embedding_batch_size = self.max_embedding_batch_size
+        self.embedding_workers = self.max_embedding_workers
+
+        self.metrics: List[dict] = []
+        self.peak_rss_mb = 0.0
+        self._process = psutil.Process()
+        self._lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        # Governor only acts when a memory ceiling is configured
+        return self.limit_mb > 0
+
+    def __enter__(self) -> "MemoryGovernor":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        # Start sampling memory in the background
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-governor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # Stop sampling and save recorded metrics
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.save_metrics()
+
+    def _run(self) -> None:
+        # Sampling loop
+        while not self._stop.wait(self.sample_interval):
+            self.sample()
+
+    def sample(self) -> float:
+        # Measure RSS once and adjust limits, returns RSS in MB
+        rss_mb = self._process.memory_info().rss / (1024 * 1024)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        usage = rss_mb / self.limit_mb
+
+        with self._lock:
+            if usage >= Config.MEMORY_HIGH_WATERMARK:
+                self._throttle(rss_mb)
+            elif usage <= Config.MEMORY_LOW_WATERMARK:
+                self._release(rss_mb)
+        return rss_mb
+
+    def _throttle(self, rss_mb: float) -> None:
+        # Reduce concurrency and batch size, then request a flush of pending vectors
+        new_values = (max(1, self.pdf_workers // 2),
+                      max(Config.MIN_EMBEDDING_BATCH_SIZE, self.embedding_batch_size // 2),
+                      max(1, self.embedding_workers // 2))
+        if new_values != (self.pdf_workers, self.embedding_batch_size, self.embedding_workers):
+            self.pdf_workers, self.embedding_batch_size, self.embedding_workers = new_values
+            self.record("throttle", rss_mb)
+        self._flush_requested.set()
+
+    def _release(self, rss_mb: float) -> None:
+        # Scale back up by one step while there is headroom
+        new_values = (min(self.max_pdf_workers, self.pdf_workers + 1),
+                      min(self.max_embedding_batch_size, self.embedding_batch_size * 2),
+                      min(self.max_embedding_workers, self.embedding_workers + 1))
+        if new_values != (self.pdf_workers, self.embedding_batch_size, self.embedding_workers):
+            self.pdf_workers, self.embedding_batch_size, self.embedding_workers = new_values
+            self.record("release", rss_mb)
+
+    def should_flush(self) -> bool:
+        # True once after each memory pressure event
+        if self._flush_requested.is_set():
+            self._flush_requested.clear()
+            return True
+        return False
+
+    def record(self, event: str, rss_mb: float = None) -> None:
+        # Record an adjustment as a metric
+        if rss_mb is None:
+            rss_mb = self._process.memory_info().rss / (1024 * 1024)
+        metric = {
+            "time": time.time(),
+            "event": event,
+            "rss_mb": round(rss_mb, 1),
+            "limit_mb": self.limit_mb,
+            "pdf_workers": self.pdf_workers,
+            "embedding_batch_size": self.embedding_batch_size,
+            "embedding_workers": self.embedding_workers
+        }
+        self.metrics.append(metric)
+        if Config.VERBOSE:
+            print(f"\n[memory] {event}: RSS {rss_mb:.0f}/{self.limit_mb:.0f} MB, "
+                  f"pdf workers {self.pdf_workers}, batch size {self.embedding_batch_size}, "
+                  f"embedding workers {self.embedding_workers}")
+
+    def save_metrics(self) -> None:
+        # Append recorded metrics to the metrics file
+        if not self.metrics:
+            return
+        os.makedirs(Config.METRICS_ROOT, exist_ok=True)
+        with open(os.path.join(Config.METRICS_ROOT, "memory_governor.jsonl"), 'a', encoding='utf-8') as f:
+            for metric in self.metrics:
+                f.write(json.dumps(metric) + "\n")
+
+    def summary(self) -> dict:
+        # Short report stored with the database version
+        return {
+            "limit_mb": self.limit_mb,
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "adjustments": sum(1 for metric in self.metrics if metric["event"] != "flush")
+        }
@@ -1,6 +1,6 @@
 import json
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional
 from config import Config
 
 @dataclass
@@ -11,18 +11,65 @@ class TextChunk:
     chunk_id: int       # Unique identifier for the chunk
     page_number: int    # Page number in PDF
     position_in_page: int # Position within the page
+    alias_of: Optional[int] = None  # Chunk id of the canonical chunk if this text is a duplicate
 
 class MetadataManager:
     def __init__(self, save_path: str = Config.METADATA_PATH):
         # Initialize metadata manager with save path
         self.save_path = save_path
         self.metadata: Dict[str, List[TextChunk]] = {}
+        self._by_id: Dict[int, TextChunk] = None
+        self._aliases: Dict[int, List[TextChunk]] = None
 
     def add_chunk(self, chunk: TextChunk) -> None:
         # Add a new chunk to metadata
         if chunk.pdf_path not in self.metadata:
             self.metadata[chunk.pdf_path] = []
         self.metadata[chunk.pdf_path].append(chunk)
+        self.invalidate()
+
+    def copy(self) -> "MetadataManager":
+        # Copy sharing chunk objects, chunks can then be added without changing this manager
+        metadata_manager = MetadataManager(self.save_path)
+        metadata_manager.metadata = {pdf_path: list(chunks) for pdf_path, chunks in self.metadata.items()}
+        return metadata_manager
+
+    def invalidate(self) -> None:
+        # Drop lookup tables, to call after modifying self.metadata directly
+        self._by_id = None
+        self._aliases = None
+
+    def _build_lookup(self) -> None:
+        # Index chunks by id and canonical chunks by their aliases
+        self._by_id = {}
+        self._aliases = {}
+        for chunks in self.metadata.values():
+            for chunk in chunks:
+                self._by_id[chunk.chunk_id] = chunk
+                if chunk.alias_of is not None:
+                    self._aliases.setdefault(chunk.alias_of, []).append(chunk)
+
+    def get_chunk(self, chunk_id: int) -> Optional[TextChunk]:
+        # Return chunk with given id, None if unknown
+        if self._by_id is None:
+            self._build_lookup()
+        return self._by_id.get(chunk_id)
+
+    def get_aliases(self, chunk_id: int) -> List[TextChunk]:
+        # Return duplicate chunks recorded as aliases of a canonical chunk
+        if self._aliases is None:
+            self._build_lookup()
+        return self._aliases.get(chunk_id, [])
+
+    def all_chunks(self) -> List[TextChunk]:
+        # Return all chunks in metadata order
+        return [chunk for chunks in self.metadata.values() for chunk in chunks]
+
+    def next_chunk_id(self) -> int:
+        # First chunk id not used yet
+        if self._by_id is None:
+            self._build_lookup()
+        return max(self._by_id, default=-1) + 1
 
     def save_metadata(self, save_path: str = None) -> None:
         # Save metadata to JSON file
@@ -45,4 +92,5 @@ class MetadataManager:
                     for pdf_path, chunks in data.items()
                 }
         except FileNotFoundError:
-            self.metadata = {}
\ No newline at end of file
+            self.metadata = {}
+        self.invalidate()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import gzip
+import json
+import zlib
+import shutil
+import hashlib
+import threading
+from typing import Generator, Iterable, List, Optional, Tuple
+from config import Config
+from .cost_model import write_json_atomic
+
+MANIFEST_FILE = "pages.json"  # Written last, marks a PDF as completely cached
+
+class PageTextCache:
+    # Content-addressed cache of raw extracted page text:
+    #     {root}/{hash[:2]}/{hash}/{page_number}.txt.gz
+    #     {root}/{hash[:2]}/{hash}/pages.json
+    # Keys are SHA-256 of the PDF bytes, so renamed or copied files are still hits
+    # and only PDFs whose bytes changed have to be parsed again.
+    # Hashes are memoized per path by file size and mtime to avoid rehashing.
+    def __init__(self, root: str = None):
+        self.root = root or Config.PAGE_CACHE_ROOT
+        self.hash_index_path = os.path.join(self.root, "hashes.json")
+        self._lock = threading.Lock()
+        self._hash_index_dirty = False
+        try:
+            with open(self.hash_index_path, 'r', encoding='utf-8') as f:
+                self.hash_index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.hash_index = {}
+
+    def file_hash(self, pdf_path: str) -> str:
+        # Return SHA-256 of a PDF, reusing the memoized value if the file did not change
+        stat = os.stat(pdf_path)
+        key = os.path.abspath(pdf_path)
+        with self._lock:
+            entry = self.hash_index.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry["sha256"]
+
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        pdf_hash = digest.hexdigest()
+
+        with self._lock:
+            self.hash_index[key] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": pdf_hash}
+            self._hash_index_dirty = True
+        return pdf_hash
+
+    def pdf_path(self, pdf_hash: str) -> str:
+        # Folder holding the pages of a PDF
+        return os.path.join(self.root, pdf_hash[:2], pdf_hash)
+
+    def has(self, pdf_hash: str) -> bool:
+        # True if all pages of the PDF are cached
+        return os.path.exists(os.path.join(self.pdf_path(pdf_hash), MANIFEST_FILE))
+
+    def iter_pages(self, pdf_hash: str) -> Generator[Tuple[str, int], None, None]:
+        # Stream cached (text, page number) pairs in page order
+        folder = self.pdf_path(pdf_hash)
+        with open(os.path.join(folder, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for page_num in manifest["pages"]:
+            with gzip.open(os.path.join(folder, f"{page_num}.txt.gz"), 'rt', encoding='utf-8') as f:
+                yield f.read(), page_num
+
+    def read_pages(self, pdf_hash: str) -> Optional[List[Tuple[str, int]]]:
+        # Read all cached pages of a PDF, None if a page file is missing or corrupt
+        # Pages are read before any is returned so a broken entry never yields part of a PDF,
+        # the entry is then discarded so the PDF is parsed and cached again
+        try:
+            return list(self.iter_pages(pdf_hash))
+        except (OSError, EOFError, ValueError, KeyError, TypeError, zlib.error) as e:
+            print(f"Discarding broken page cache entry {pdf_hash}: {str(e)}")
+            self.discard(pdf_hash)
+            return None
+
+    def discard(self, pdf_hash: str) -> None:
+        # Remove the cached pages of a PDF
+        shutil.rmtree(self.pdf_path(pdf_hash), ignore_errors=True)
+
+    def store(self, pdf_hash: str, pages: Iterable[Tuple[str, int]]) -> Generator[Tuple[str, int], None, None]:
+        # Write pages to the cache while passing them through to the caller
+        # The manifest is only written once every page is stored
+        folder = self.pdf_path(pdf_hash)
+        os.makedirs(folder, exist_ok=True)
+        page_numbers = []
+        for text, page_num in pages:
+            page_path = os.path.join(folder, f"{page_num}.txt.gz")
+            tmp_path = f"{page_path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp_path, 'wt', encoding='utf-8',
+                           compresslevel=Config.PAGE_CACHE_COMPRESSION) as f:
+                f.write(text)
+            os.replace(tmp_path, page_path)
+            page_numbers.append(page_num)
+            yield text, page_num
+        write_json_atomic(os.path.join(folder, MANIFEST_FILE), {"pages": page_numbers})
+
+    def save(self) -> None:
+        # Persist memoized hashes
+        with self._lock:
+            if self._hash_index_dirty:
+                write_json_atomic(self.hash_index_path, self.hash_index)
+                self._hash_index_dirty = False
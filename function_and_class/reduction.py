@@ -0,0 +1,37 @@
+import numpy as np
+from typing import List
+from config import Config
+from .faiss_index import FAISSIndex
+
+def reduction_report(embeddings: np.ndarray,
+                     target_dims: List[int] = None,
+                     method: str = None,
+                     k: int = Config.DEFAULT_TOP_K,
+                     num_queries: int = None) -> List[dict]:
+    # Measure the recall/size tradeoff of reduction on a sample of embeddings
+    # Queries are held out from the sample, ground truth is exact search at full dimension
+    # recall@k = share of the true k nearest neighbors found by the reduced index
+    target_dims = target_dims or Config.REDUCTION_REPORT_DIMS
+    method = method or Config.REDUCTION_METHOD or "pca"
+    num_queries = num_queries or Config.REDUCTION_REPORT_QUERIES
+    embeddings = np.asarray(embeddings, dtype='float32')
+    num_queries = min(num_queries, len(embeddings) // 10)
+    if num_queries == 0:
+        raise ValueError("Not enough embeddings for a reduction report")
+    queries, base = embeddings[:num_queries], embeddings[num_queries:]
+    input_dim = embeddings.shape[1]
+
+    full_index = FAISSIndex(input_dim)
+    full_index.add_vectors(base)
+    _, true_ids = full_index.search(queries, k)
+
+    report = [{"dimension": input_dim, "recall": 1.0, "bytes_per_vector": input_dim * 4}]
+    for dim in sorted(d for d in target_dims if d < input_dim):
+        reduced_index = FAISSIndex(input_dim, method, dim)
+        reduced_index.train(base)
+        reduced_index.add_vectors(base)
+        _, found_ids = reduced_index.search(queries, k)
+        recall = np.mean([len(set(found) & set(true)) / k for found, true in zip(found_ids, true_ids)])
+        report.append({"dimension": dim, "recall": float(recall), "bytes_per_vector": dim * 4})
+
+    return report
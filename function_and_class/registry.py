@@ -0,0 +1,119 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Optional, TypeVar
+from sentence_transformers import SentenceTransformer
+from config import Config
+
+T = TypeVar("T")
+
+# Embedding models loaded in this process, shared by every database using the same model
+_models: Dict[str, SentenceTransformer] = {}
+_models_lock = threading.Lock()
+
+def get_shared_model(model_name: str = Config.MODEL_NAME) -> SentenceTransformer:
+    # Return the process-wide instance of a model, loading it on first use
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+def is_model_loaded(model_name: str = Config.MODEL_NAME) -> bool:
+    # True if the model is already loaded in this process
+    with _models_lock:
+        return model_name in _models
+
+class DatabaseRegistry(Generic[T]):
+    # Process-wide cache of loaded databases, least recently used ones are evicted
+    # when their estimated memory exceeds the budget
+    # Loading, sizing and eviction are delegated so the registry does not depend on the database class
+    # size_of is called for every cached database on each lookup, it must return a stored value
+    def __init__(self,
+                 loader: Callable[[str], Optional[T]],
+                 size_of: Callable[[T], float],
+                 on_evict: Callable[[T], None] = None,
+                 memory_budget_mb: float = None):
+        self.loader = loader
+        self.size_of = size_of
+        self.on_evict = on_evict
+        self.memory_budget_mb = memory_budget_mb
+        self.entries: "OrderedDict[str, T]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    @property
+    def budget_mb(self) -> float:
+        # Budget read at call time so Config changes apply
+        return Config.DB_CACHE_MEMORY_MB if self.memory_budget_mb is None else self.memory_budget_mb
+
+    def get(self, db_name: str) -> Optional[T]:
+        # Return a loaded database, loading it on a miss
+        with self._lock:
+            if db_name in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(db_name)
+                self._evict(keep=db_name)  # Hot reloads may have grown cached databases
+                return self.entries[db_name]
+
+            self.misses += 1
+            start = time.perf_counter()
+            db = self.loader(db_name)
+            self.load_seconds += time.perf_counter() - start
+            if db is None:
+                return None
+
+            self.entries[db_name] = db
+            self._evict(keep=db_name)
+            return db
+
+    def holds(self, db: T) -> bool:
+        # True if this database instance is cached
+        with self._lock:
+            return any(cached is db for cached in self.entries.values())
+
+    def memory_usage_mb(self) -> float:
+        # Estimated memory of all cached databases
+        with self._lock:
+            return sum(self.size_of(db) for db in self.entries.values())
+
+    def _evict(self, keep: str) -> None:
+        # Evict least recently used databases until under budget, never the one just used
+        while self.memory_usage_mb() > self.budget_mb:
+            db_name = next((name for name in self.entries if name != keep), None)
+            if db_name is None:
+                break
+            self.evict(db_name)
+
+    def evict(self, db_name: str) -> None:
+        # Drop a database from the cache
+        with self._lock:
+            db = self.entries.pop(db_name, None)
+            if db is None:
+                return
+            self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(db)
+
+    def clear(self) -> None:
+        # Drop all databases
+        for db_name in list(self.entries):
+            self.evict(db_name)
+
+    def stats(self) -> dict:
+        # Cache statistics
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "loaded": list(self.entries),
+                "memory_mb": self.memory_usage_mb(),
+                "budget_mb": self.budget_mb,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "average_load_seconds": self.load_seconds / self.misses if self.misses else 0.0
+            }
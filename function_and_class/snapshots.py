@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import uuid
+import shutil
+from typing import List, Optional, Tuple
+from config import Config
+from .faiss_index import FAISSIndex
+from .metadata import MetadataManager
+
+CURRENT_POINTER = "CURRENT"  # File holding the name of the live version
+VERSIONS_DIR = "versions"     # Folder holding one immutable folder per version
+STAGING_PREFIX = ".staging-"  # Prefix of versions still being written
+MANIFEST_FILE = "manifest.json"
+
+class SnapshotManager:
+    # Manage versioned, immutable snapshots of a database:
+    #     {DATABASE_ROOT}/{db_name}/CURRENT                      -> name of the live version
+    #     {DATABASE_ROOT}/{db_name}/versions/{version}/{db_name}.faiss
+    #     {DATABASE_ROOT}/{db_name}/versions/{version}/{db_name}.json
+    #     {DATABASE_ROOT}/{db_name}/versions/{version}/manifest.json
+    # A version is written in a staging folder, renamed into place once complete,
+    # and only then published by atomically replacing the CURRENT pointer.
+    # Readers therefore never see a half-written index or metadata file.
+    def __init__(self, db_name: str, root: str = None):
+        self.db_name = db_name
+        self.db_path = os.path.join(root or Config.DATABASE_ROOT, db_name)
+        self.versions_path = os.path.join(self.db_path, VERSIONS_DIR)
+
+    def version_path(self, version: str) -> str:
+        # Folder of a given version
+        return os.path.join(self.versions_path, version)
+
+    def current_version(self) -> Optional[str]:
+        # Read the CURRENT pointer, None if the database has never been published
+        try:
+            with open(os.path.join(self.db_path, CURRENT_POINTER), 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+            return version or None
+        except FileNotFoundError:
+            return None
+
+    def list_versions(self) -> List[str]:
+        # List published versions, oldest first (version names sort chronologically)
+        if not os.path.isdir(self.versions_path):
+            return []
+        return sorted(v for v in os.listdir(self.versions_path)
+                      if not v.startswith(STAGING_PREFIX)
+                      and os.path.isdir(self.version_path(v)))
+
+    def resolve_paths(self, version: str = None) -> Tuple[str, str]:
+        # Return (index path, metadata path) of a version, the current one by default
+        # Databases saved before versioning keep their files at the database root
+        version = version or self.current_version()
+        folder = self.version_path(version) if version else self.db_path
+        return (os.path.join(folder, f"{self.db_name}.faiss"),
+                os.path.join(folder, f"{self.db_name}.json"))
+
+    def read_manifest(self, version: str = None) -> dict:
+        # Load the manifest of a version, empty for legacy databases
+        version = version or self.current_version()
+        if not version:
+            return {}
+        try:
+            with open(os.path.join(self.version_path(version), MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def begin_version(self) -> str:
+        # Create an empty staging folder for a new version and return its path
+        os.makedirs(self.versions_path, exist_ok=True)
+        staging = os.path.join(self.versions_path, f"{STAGING_PREFIX}{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        return staging
+
+    def commit_version(self, staging: str, manifest: dict = None) -> str:
+        # Seal a staging folder as a new immutable version and publish it
+        now = time.time()
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:6]}"
+        info = {
+            "version": version,
+            "db_name": self.db_name,
+            "created_at": time.time(),
+            "previous_version": self.current_version(),
+        }
+        info.update(manifest or {})
+        with open(os.path.join(staging, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+
+        os.rename(staging, self.version_path(version))
+        self._write_pointer(version)
+        self.prune()
+        return version
+
+    def publish(self, faiss_index: FAISSIndex, metadata_manager: MetadataManager, manifest: dict = None) -> str:
+        # Write index and metadata as a new version and make it current
+        staging = self.begin_version()
+        try:
+            metadata_manager.save_metadata(os.path.join(staging, f"{self.db_name}.json"))
+            faiss_index.save_index(os.path.join(staging, f"{self.db_name}.faiss"))
+            info = {
+                "total_vectors": faiss_index.index.ntotal,
+                "dimension": faiss_index.dimension,
+                "stored_dimension": faiss_index.stored_dimension,
+                "reduction_method": faiss_index.reduction_method,
+                "model_name": Config.MODEL_NAME
+            }
+            info.update(manifest or {})
+            return self.commit_version(staging, info)
+        except Exception:
+            self.abort_version(staging)
+            raise
+
+    def abort_version(self, staging: str) -> None:
+        # Discard a staging folder after a failed save
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def prune(self, keep: int = None) -> None:
+        # Remove the oldest versions, always keeping the live one
+        # Readers load a version fully in memory, so removing its files afterwards is safe
+        keep = Config.SNAPSHOT_KEEP_VERSIONS if keep is None else keep
+        if keep <= 0:
+            return
+        current = self.current_version()
+        versions = self.list_versions()
+        for version in versions[:-keep]:
+            if version != current:
+                shutil.rmtree(self.version_path(version), ignore_errors=True)
+
+    def _write_pointer(self, version: str) -> None:
+        # Atomically replace the CURRENT pointer (write to temp file then rename)
+        tmp_path = os.path.join(self.db_path, f".{CURRENT_POINTER}.{uuid.uuid4().hex}")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.db_path, CURRENT_POINTER))
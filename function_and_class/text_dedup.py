@@ -0,0 +1,98 @@
+import re
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32, keeps (a * x + b) within uint64
+_WORD_PATTERN = re.compile(r'\w+')
+
+def normalize_text(text: str) -> str:
+    # Lowercase and keep only words, so layout and punctuation noise do not hide duplicates
+    return ' '.join(_WORD_PATTERN.findall(text.lower()))
+
+class TextDeduplicator:
+    # Detect duplicate chunks before embedding them:
+    # - exact duplicates through a hash of the normalized text
+    # - near duplicates through MinHash signatures of word shingles, indexed in LSH bands
+    # Chunks are fed in order, the first occurrence of a text becomes the canonical chunk.
+    def __init__(self,
+                 threshold: float = Config.TEXT_DEDUP_THRESHOLD,
+                 num_perm: int = Config.MINHASH_PERMUTATIONS,
+                 bands: int = Config.MINHASH_BANDS,
+                 shingle_size: int = Config.SHINGLE_SIZE,
+                 seed: int = 1):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Random universal hash functions h(x) = (a * x + b) mod prime
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2**31, size=(num_perm, 1)).astype(np.uint64)
+        self.b = rng.randint(0, 2**31, size=(num_perm, 1)).astype(np.uint64)
+
+        self.exact: Dict[str, int] = {}                           # Text hash -> canonical chunk id
+        self.signatures: Dict[int, np.ndarray] = {}               # Canonical chunk id -> signature
+        self.buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _shingles(self, normalized: str) -> np.ndarray:
+        # Hash overlapping word n-grams to 32-bit integers
+        words = normalized.split()
+        if len(words) <= self.shingle_size:
+            grams = [' '.join(words)]
+        else:
+            grams = [' '.join(words[i:i + self.shingle_size])
+                     for i in range(len(words) - self.shingle_size + 1)]
+        return np.array([int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=4).digest(), 'little')
+                         for gram in set(grams)], dtype=np.uint64)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        # MinHash signature: minimum of each hash function over all shingles
+        shingles = self._shingles(normalized)
+        return ((self.a * shingles[np.newaxis, :] + self.b) % _PRIME).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        # One LSH key per band of rows
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def add(self, chunk_id: int, text: str) -> Optional[int]:
+        # Register a chunk, return the id of its canonical chunk if it is a duplicate, None otherwise
+        normalized = normalize_text(text)
+        text_hash = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        if text_hash in self.exact:
+            self.exact_duplicates += 1
+            return self.exact[text_hash]
+
+        signature = self.signature(normalized)
+        band_keys = self._band_keys(signature)
+        candidates = set()
+        for band, key in enumerate(band_keys):
+            candidates.update(self.buckets[band].get(key, ()))
+
+        # Keep the candidate with the highest estimated Jaccard similarity
+        best_id, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate, similarity
+        if best_id is not None and best_similarity >= self.threshold:
+            self.near_duplicates += 1
+            self.exact[text_hash] = best_id
+            return best_id
+
+        # New canonical chunk
+        self.exact[text_hash] = chunk_id
+        self.signatures[chunk_id] = signature
+        for band, key in enumerate(band_keys):
+            self.buckets[band].setdefault(key, []).append(chunk_id)
+        return None
+
+    def stats(self) -> Tuple[int, int]:
+        # Return (exact duplicates, near duplicates) found so far
+        return self.exact_duplicates, self.near_duplicates
@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import faiss
+import numpy as np
+from typing import Iterator
+from tqdm import tqdm
+from config import Config
+from .metadata import MetadataManager, TextChunk
+from .faiss_index import FAISSIndex, REDUCTION_METHODS
+from .snapshots import SnapshotManager
+from .cost_model import write_json_atomic
+from .utils import database_registry
+
+# Layout of an export folder:
+#     manifest.json           source, model, dimension, counts and segment file names, written last
+#     chunks-00000.jsonl      one chunk per line, in metadata order (grouped by PDF)
+#     vectors-00000.npy       float32 vectors, at the embedding dimension for databases without reduction,
+#                             as stored (reduced and normalized) for reduced databases
+#     ids-00000.npy           int64 chunk id of each vector of the matching vectors segment
+#     transform.faiss         empty index holding the trained reduction, for reduced databases only
+# Original embeddings of a reduced database are not kept, so it can only be imported with its own reduction
+EXPORT_FORMAT = "pdf-to-vectordb-export"
+EXPORT_FORMAT_VERSION = 2
+TRANSFORM_FILE = "transform.faiss"
+
+
+##################################
+# Export                         #
+##################################
+
+
+def export_database(db_name: str, output_directory: str, segment_size: int = None) -> dict:
+    # Export the current version of a database as chunk and vector segments
+    # Segments are written one at a time, nothing beyond the loaded database is held in memory.
+    # The folder is written under a temporary name and renamed once complete.
+    # Returns the export manifest
+    segment_size = segment_size or Config.INDEX_BLOCK_SIZE
+    if os.path.exists(output_directory):
+        raise ValueError(f"{output_directory} already exists")
+
+    snapshots = SnapshotManager(db_name)
+    version = snapshots.current_version()
+    index_path, metadata_path = snapshots.resolve_paths(version)
+    metadata_manager = MetadataManager()
+    metadata_manager.load_metadata(metadata_path)
+    faiss_index = FAISSIndex.from_file(index_path)
+
+    staging = f"{output_directory.rstrip(os.sep)}.{os.getpid()}.tmp"
+    os.makedirs(staging)
+    try:
+        chunk_files = []
+        chunks = metadata_manager.all_chunks()
+        for start in tqdm(range(0, len(chunks), segment_size), desc="Exporting chunks", unit="segments"):
+            name = f"chunks-{len(chunk_files):05d}.jsonl"
+            with open(os.path.join(staging, name), 'w', encoding='utf-8') as f:
+                for chunk in chunks[start:start + segment_size]:
+                    f.write(json.dumps(chunk.__dict__, ensure_ascii=False) + "\n")
+            chunk_files.append(name)
+
+        if faiss_index.reduction_method:
+            faiss.write_index(faiss_index.empty_copy().index, os.path.join(staging, TRANSFORM_FILE))
+
+        vector_files = []
+        vector_blocks = faiss_index.iter_vectors(block_size=segment_size)
+        for ids, vectors in tqdm(vector_blocks, desc="Exporting vectors", unit="segments"):
+            number = len(vector_files)
+            np.save(os.path.join(staging, f"vectors-{number:05d}.npy"), vectors.astype('float32'))
+            np.save(os.path.join(staging, f"ids-{number:05d}.npy"), ids.astype('int64'))
+            vector_files.append({"vectors": f"vectors-{number:05d}.npy",
+                                 "ids": f"ids-{number:05d}.npy",
+                                 "count": len(ids)})
+
+        manifest = {
+            "format": EXPORT_FORMAT,
+            "format_version": EXPORT_FORMAT_VERSION,
+            "source": {"db_name": db_name, "version": version},
+            "model_name": snapshots.read_manifest(version).get("model_name", Config.MODEL_NAME),
+            "dimension": faiss_index.dimension,
+            "reduction_method": faiss_index.reduction_method,
+            "stored_dimension": faiss_index.stored_dimension,
+            "vector_space": "stored" if faiss_index.reduction_method else "input",
+            "total_chunks": len(chunks),
+            "total_vectors": faiss_index.index.ntotal,
+            "chunk_files": chunk_files,
+            "vector_files": vector_files,
+            "exported_at": time.time()
+        }
+        write_json_atomic(os.path.join(staging, "manifest.json"), manifest)
+        os.rename(staging, output_directory)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"Exported {db_name} ({manifest['total_chunks']} chunks, "
+          f"{manifest['total_vectors']} vectors) to {output_directory}")
+    return manifest
+
+
+##################################
+# Import                         #
+##################################
+
+
+def read_export_manifest(input_directory: str) -> dict:
+    # Read and check the manifest of an export folder
+    manifest_path = os.path.join(input_directory, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"{input_directory} is not a complete export (no manifest.json)")
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("format") != EXPORT_FORMAT or manifest.get("format_version", 0) > EXPORT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format in {input_directory}")
+    return manifest
+
+def iter_exported_chunks(input_directory: str, manifest: dict) -> Iterator[TextChunk]:
+    # Stream chunks of an export, segment by segment
+    for name in manifest["chunk_files"]:
+        with open(os.path.join(input_directory, name), 'r', encoding='utf-8') as f:
+            for line in f:
+                yield TextChunk(**json.loads(line))
+
+def import_database(input_directory: str,
+                    db_name: str,
+                    reduction_method: str = "keep",
+                    reduction_dim: int = None,
+                    replace: bool = False) -> str:
+    # Import an export folder as a new version of a database, without re-embedding
+    # reduction_method "keep" reuses the reduction of the exported database and its vectors as they are.
+    # For databases exported without reduction, "none" stores full vectors and "pca"/"truncate"
+    # migrate to a reduction, learned from the first vector segment.
+    # Vector segments are memory mapped and added to the index one at a time.
+    # Returns the published version
+    manifest = read_export_manifest(input_directory)
+    if not replace and os.path.exists(os.path.join(Config.DATABASE_ROOT, db_name)):
+        raise ValueError(f"Database {db_name} already exists")
+    if manifest["model_name"] != Config.MODEL_NAME:
+        print(f"Warning: vectors were made with {manifest['model_name']}, "
+              f"queries will be embedded with {Config.MODEL_NAME}")
+
+    # Exports of reduced databases hold reduced vectors, mapping them back to the embedding
+    # dimension would give approximations that are not normalized, so they cannot migrate
+    stored_vectors = manifest.get("vector_space", "input") == "stored"
+    if manifest["reduction_method"] and reduction_method != "keep":
+        raise ValueError(f"{input_directory} was exported with {manifest['reduction_method']} reduction, "
+                         f"it can only be imported with reduction 'keep'")
+    if reduction_method == "keep" and stored_vectors:
+        if reduction_dim and reduction_dim != manifest["stored_dimension"]:
+            raise ValueError(f"Exported vectors have dimension {manifest['stored_dimension']}, "
+                             f"they cannot be reduced to {reduction_dim}")
+        faiss_index = FAISSIndex.from_file(os.path.join(input_directory, TRANSFORM_FILE))
+    else:
+        if reduction_method == "keep":
+            reduction_method = manifest["reduction_method"]
+            reduction_dim = reduction_dim or manifest["stored_dimension"]
+        elif reduction_method == "none":
+            reduction_method = None
+        faiss_index = FAISSIndex(manifest["dimension"], reduction_method,
+                                 (reduction_dim or Config.REDUCTION_DIM) if reduction_method else None)
+    vector_dimension = manifest["stored_dimension"] if stored_vectors else manifest["dimension"]
+
+    for segment in tqdm(manifest["vector_files"], desc="Importing vectors", unit="segments"):
+        vectors = np.load(os.path.join(input_directory, segment["vectors"]), mmap_mode='r')
+        ids = np.load(os.path.join(input_directory, segment["ids"]))
+        if vectors.shape != (segment["count"], vector_dimension) or len(ids) != segment["count"]:
+            raise ValueError(f"Segment {segment['vectors']} does not match the manifest")
+        if stored_vectors:
+            faiss_index.add_stored_vectors(vectors, ids)
+        else:
+            faiss_index.add_vectors(vectors, ids)
+
+    metadata_manager = MetadataManager()
+    for chunk in iter_exported_chunks(input_directory, manifest):
+        metadata_manager.add_chunk(chunk)
+    if len(metadata_manager.all_chunks()) != manifest["total_chunks"]:
+        raise ValueError(f"Chunk segments of {input_directory} do not match the manifest")
+
+    version = SnapshotManager(db_name).publish(faiss_index, metadata_manager, {
+        "model_name": manifest["model_name"],
+        "imported_from": manifest["source"],
+        "imported_at": time.time()
+    })
+    print(f"Imported {manifest['total_chunks']} chunks and {faiss_index.index.ntotal} vectors "
+          f"into {db_name} (version {version})")
+    return version
+
+
+def export_existing_database() -> None:
+    # Interactive export of a database
+    db_name = input("Enter database name to export: ")
+    output_directory = input("Enter export directory (must not exist): ")
+    try:
+        export_database(db_name, output_directory)
+    except Exception as e:
+        print(f"Error exporting database: {str(e)}")
+
+def import_exported_database():
+    # Interactive import of an export folder, returns the loaded database
+    input_directory = input("Enter export directory: ")
+    db_name = input("Enter new database name: ")
+    choices = ", ".join(("keep", "none") + REDUCTION_METHODS)
+    reduction_method = input(f"Reduction ({choices}, empty = keep): ") or "keep"
+    reduction_dim = None
+    if reduction_method in REDUCTION_METHODS:
+        try:
+            reduction_dim = int(input(f"Reduced dimension ({Config.REDUCTION_DIM}): ") or Config.REDUCTION_DIM)
+        except ValueError:
+            print("Invalid dimension!")
+            return None
+
+    try:
+        import_database(input_directory, db_name, reduction_method, reduction_dim)
+    except Exception as e:
+        print(f"Error importing database: {str(e)}")
+        return None
+    return database_registry.get(db_name)
+
+
+##################################
+# Command line                   #
+##################################
+
+
+def main():
+    # Entry point for non interactive use, e.g. to move a database to another node:
+    #     python -m function_and_class.transfer export --db NAME --output DIR
+    #     python -m function_and_class.transfer import --input DIR --db NAME [--reduction pca --reduction-dim 128]
+    parser = argparse.ArgumentParser(description="Database export and import")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a database to a folder of segments")
+    export_parser.add_argument("--db", required=True, help="Database name")
+    export_parser.add_argument("--output", required=True, help="Export directory, must not exist")
+    export_parser.add_argument("--segment-size", type=int, default=Config.INDEX_BLOCK_SIZE)
+
+    import_parser = subparsers.add_parser("import", help="Import a folder of segments as a database")
+    import_parser.add_argument("--input", required=True, help="Export directory")
+    import_parser.add_argument("--db", required=True, help="Database name")
+    import_parser.add_argument("--reduction", default="keep", choices=("keep", "none") + REDUCTION_METHODS)
+    import_parser.add_argument("--reduction-dim", type=int, default=None)
+    import_parser.add_argument("--replace", action="store_true", help="Publish over an existing database")
+
+    args = parser.parse_args()
+    match args.command:
+        case "export":
+            export_database(args.db, args.output, args.segment_size)
+        case "import":
+            import_database(args.input, args.db, args.reduction, args.reduction_dim, args.replace)
+
+if __name__ == "__main__":
+    main()
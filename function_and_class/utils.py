@@ -3,12 +3,22 @@ import fitz  # PyMuPDF
 import re
 import concurrent.futures
 import time
+import threading
 import psutil
-from typing import List, Generator, Tuple
+import numpy as np
+from dataclasses import replace
+from typing import List, Dict, Generator, Tuple
 from tqdm import tqdm
 from .metadata import MetadataManager, TextChunk
-from .embeddings import EmbeddingManager
+from .embeddings import EmbeddingManager, embedding_matrix
 from .faiss_index import FAISSIndex
+from .snapshots import SnapshotManager
+from .page_cache import PageTextCache
+from .text_dedup import TextDeduplicator
+from .memory_governor import MemoryGovernor
+from .reduction import reduction_report
+from .cost_model import CostModel, count_pages, get_host_id, apply_host_profile
+from .registry import DatabaseRegistry, is_model_loaded
 from config import Config
 
 
@@ -44,37 +54,70 @@ def extract_text_from_pdf(pdf_path: str) -> Generator[Tuple[str, int], None, Non
     except Exception as e:
         print(f"Error extracting PDF {pdf_path}: {str(e)}")
 
-def process_pdf(pdf_path: str) -> List[Tuple[str, int, str]]:
+def extract_raw_pages(pdf_path: str) -> Generator[Tuple[str, int], None, None]:
+    # Parse PDF and yield raw (text, page number) of each non-empty page
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(len(doc)):
+            text = doc[page_num].get_text()
+            if text:
+                yield text, page_num + 1
+
+def process_pdf(pdf_path: str, page_cache: PageTextCache = None) -> List[Tuple[str, int, str]]:
     # Process single PDF and return list of (text, page number, path) tuples
+    # Raw page text is read from the cache when the PDF bytes were already parsed,
+    # the PDF is parsed again if its cache entry cannot be read
     results = []
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
+        if page_cache is None:
+            pages = extract_raw_pages(pdf_path)
+        else:
+            pdf_hash = page_cache.file_hash(pdf_path)
+            pages = page_cache.read_pages(pdf_hash) if page_cache.has(pdf_hash) else None
+            if pages is None:
+                pages = page_cache.store(pdf_hash, extract_raw_pages(pdf_path))
+
+        for text, page_num in pages:
             cleaned_text = clean_text(text)
             if cleaned_text:
-                results.append((cleaned_text, page_num + 1, pdf_path))
+                results.append((cleaned_text, page_num, pdf_path))
     except Exception as e:
         print(f"Error processing PDF {pdf_path}: {str(e)}")
     return results
 
-def parallel_extract_text_from_pdfs(pdf_files: List[str], max_workers: int = Config.MAX_WORKERS_PDF) -> List[Tuple[str, int, str]]:
+def parallel_extract_text_from_pdfs(pdf_files: List[str],
+                                    max_workers: int = None,
+                                    page_cache: PageTextCache = None,
+                                    governor: MemoryGovernor = None) -> List[Tuple[str, int, str]]:
     # Extract text from multiple PDFs in parallel
+    # PDFs are submitted as workers free up, so a governor can lower concurrency on the way
+    max_workers = max_workers or Config.MAX_WORKERS_PDF
     all_results = []
+    remaining = iter(pdf_files)
+    futures = {}
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_pdf, pdf_path): pdf_path for pdf_path in pdf_files}
-        
         with tqdm(total=len(pdf_files), desc="Extracting PDFs") as pbar:
-            for future in concurrent.futures.as_completed(futures):
-                pdf_path = futures[future]
-                try:
-                    results = future.result()
-                    all_results.extend(results)
-                except Exception as e:
-                    print(f"Error with {pdf_path}: {str(e)}")
-                pbar.update(1)
-                
+            while True:
+                in_flight = governor.pdf_workers if governor else max_workers
+                while len(futures) < in_flight:
+                    pdf_path = next(remaining, None)
+                    if pdf_path is None:
+                        break
+                    futures[executor.submit(process_pdf, pdf_path, page_cache)] = pdf_path
+                if not futures:
+                    break
+
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    pdf_path = futures.pop(future)
+                    try:
+                        results = future.result()
+                        all_results.extend(results)
+                    except Exception as e:
+                        print(f"Error with {pdf_path}: {str(e)}")
+                    pbar.update(1)
+
+    if page_cache is not None:
+        page_cache.save()
     return all_results
 
 def split_text_into_chunks(text: str) -> List[str]:
@@ -165,93 +208,252 @@ class PDFVectorDatabase:
         self.metadata_manager = MetadataManager()
         self.embedding_manager = EmbeddingManager()
         self.faiss_index = None
+        self.db_name = None
+        self.current_version = None
+        self.memory_mb = 0.0  # Estimated memory of index and metadata, updated when they are swapped
+        # Guards swapping of index and metadata during hot reload
+        self._state_lock = threading.Lock()
+        self._reload_thread = None
+        self._stop_reload = threading.Event()
 
     def log(self, message: str) -> None:
         # Display message if verbose mode is enabled
         if Config.VERBOSE:
             print(message)
 
-    def process_pdfs(self, progress_callback=None, skip_dedup: bool = True, db_name: str = Config.DATABASE_DEFAULT_NAME):
-        # Create database directory
-        database_path = os.path.join(Config.DATABASE_ROOT, db_name)
-        os.makedirs(database_path, exist_ok=True)
-
-        # Get and process all PDFs from input directory
-        pdf_files = get_pdf_files(self.input_directory)
+    def process_pdfs(self,
+                     progress_callback=None,
+                     skip_dedup: bool = True,
+                     db_name: str = Config.DATABASE_DEFAULT_NAME,
+                     pdf_files: List[str] = None,
+                     manifest: dict = None,
+                     reduce: bool = True):
+        # Get and process all PDFs from input directory, or only the given ones
+        # Without reduce, vectors are stored at full dimension whatever Config.REDUCTION_METHOD
+        apply_host_profile()
+        if pdf_files is None:
+            pdf_files = get_pdf_files(self.input_directory)
         
-        self.log("\nExtracting text from PDFs...")
-        extracted_texts = parallel_extract_text_from_pdfs(pdf_files)
+        with MemoryGovernor() as governor:
+            self.log("\nExtracting text from PDFs...")
+            page_cache = PageTextCache() if Config.PAGE_CACHE_ENABLED else None
+            extracted_texts = parallel_extract_text_from_pdfs(pdf_files, page_cache=page_cache, governor=governor)
+            
+            # Process extracted texts into chunks
+            all_chunks = self.chunk_pages(extracted_texts, 0, progress_callback)
+            del extracted_texts
+
+            # Create FAISS index, filled as embeddings are generated
+            self.log("Creating FAISS index...")
+            reduction_method = Config.REDUCTION_METHOD if reduce else None
+            faiss_index = FAISSIndex(self.embedding_manager.model.get_sentence_embedding_dimension(),
+                                     reduction_method, Config.REDUCTION_DIM)
+            self.embed_and_index(all_chunks, skip_dedup, governor, faiss_index)
+            metadata_manager = MetadataManager()
+            for text_chunk in all_chunks:
+                metadata_manager.add_chunk(text_chunk)
         
-        # Process extracted texts into chunks
+        # Save database files
+        self.log("Saving database files...")
+        self.publish(db_name, faiss_index, metadata_manager, {"memory": governor.summary(), **(manifest or {})})
+
+    def embed_and_index(self,
+                        chunks: List[TextChunk],
+                        skip_dedup: bool,
+                        governor: MemoryGovernor,
+                        faiss_index: FAISSIndex) -> int:
+        # Embed chunks window by window into a preallocated matrix and add their vectors to faiss_index
+        # faiss_index must not be the live index: searches may run on it meanwhile
+        # Duplicate chunks get their alias_of set, callers add chunks to metadata afterwards
+        # The matrix is a disk-backed memmap for large corpora, and whenever the governor is enabled
+        # so that a flush releases its pages instead of adding index memory on top (see embedding_matrix).
+        # Embedded rows not indexed yet are pending, they are streamed to the index block by block
+        # when there are too many of them or on memory pressure.
+        # The index keeps every vector in RAM: peak memory is bounded by the index size,
+        # the matrix only avoids holding the vectors a second time.
+        # Returns the number of vectors added
+        # Text aliases of each canonical chunk, re-pointed if their canonical chunk
+        # turns out to duplicate a vector, so aliases never chain
+        text_aliases: Dict[int, List[TextChunk]] = {}
+        if Config.TEXT_DEDUP_ENABLED:
+            # Skip embedding of duplicate texts, they stay in metadata as aliases
+            self.log("\nDetecting duplicate texts...")
+            canonical_chunks = self.mark_text_duplicates(chunks)
+            for chunk in chunks:
+                if chunk.alias_of is not None:
+                    text_aliases.setdefault(chunk.alias_of, []).append(chunk)
+            chunks = canonical_chunks
+
+        chunk_ids = np.array([chunk.chunk_id for chunk in chunks], dtype='int64')
+        chunks_by_id = {chunk.chunk_id: chunk for chunk in chunks}
+        dimension = self.embedding_manager.model.get_sentence_embedding_dimension()
+        indexed = embedded = added = 0
+        train_size = min(Config.REDUCTION_TRAIN_SIZE, len(chunks))
+
+        def flush(final: bool = False):
+            # Stream pending rows of the matrix to the index
+            # An untrained reduction is first learned from REDUCTION_TRAIN_SIZE embeddings,
+            # flushes are delayed until they are available
+            nonlocal indexed, added
+            if not faiss_index.is_trained and embedded > indexed:
+                if embedded < train_size and not final:
+                    return
+                faiss_index.train(np.asarray(matrix[:min(embedded, train_size)]))
+            for start in range(indexed, embedded, Config.INDEX_BLOCK_SIZE):
+                end = min(start + Config.INDEX_BLOCK_SIZE, embedded)
+                ids, vectors = chunk_ids[start:end], np.asarray(matrix[start:end])
+                if not skip_dedup:
+                    vectors, unique_indices, duplicates = EmbeddingManager.deduplicate_against_index(
+                        vectors, ids, faiss_index)
+                    for position, chunk_id in duplicates.items():
+                        duplicate_id = int(ids[position])
+                        for chunk in [chunks_by_id[duplicate_id]] + text_aliases.get(duplicate_id, []):
+                            chunk.alias_of = chunk_id
+                    ids = ids[unique_indices]
+                faiss_index.add_vectors(vectors, ids)
+                added += len(ids)
+            indexed = embedded
+            if isinstance(matrix, np.memmap):
+                # Written pages can then be dropped from memory
+                matrix.flush()
+
+        self.log("\nGenerating embeddings in parallel...")
+        if skip_dedup:
+            self.log("Skipping deduplication...")
+        with embedding_matrix(len(chunks), dimension, disk_backed=governor.enabled) as matrix:
+            for start in range(0, len(chunks), Config.EMBEDDING_WINDOW_SIZE):
+                window = chunks[start:start + Config.EMBEDDING_WINDOW_SIZE]
+                self.embedding_manager.generate_embeddings(
+                    [chunk.text for chunk in window], governor=governor,
+                    out=matrix[start:start + len(window)])
+                embedded = start + len(window)
+
+                if governor.should_flush():
+                    governor.record("flush")
+                    flush()
+                elif embedded - indexed >= Config.MAX_PENDING_VECTORS:
+                    flush()
+            flush(final=True)
+
+        self.log(f"Vectors added: {added} out of {len(chunks)} embedded chunks")
+        return added
+
+    def chunk_pages(self,
+                    extracted_texts: List[Tuple[str, int, str]],
+                    first_chunk_id: int,
+                    progress_callback=None) -> List[TextChunk]:
+        # Split extracted pages into chunks with consecutive ids
         all_chunks = []
-        chunk_id = 0
-        total_chunks = 0
-        total_pages = 0
-        
+        chunk_id = first_chunk_id
+
         for text, page_num, pdf_path in extracted_texts:
             chunks = split_text_into_chunks(text)
-            total_pages += 1
             
             for pos, chunk in enumerate(chunks):
-                text_chunk = TextChunk(
+                all_chunks.append(TextChunk(
                     text=chunk,
                     pdf_path=pdf_path,
                     chunk_id=chunk_id,
                     page_number=page_num,
                     position_in_page=pos
-                )
-                all_chunks.append(text_chunk)
-                self.metadata_manager.add_chunk(text_chunk)
+                ))
                 chunk_id += 1
-                total_chunks += 1
                 
             if progress_callback and Config.VERBOSE:
                 progress_callback(pdf_path, len(chunks), 1)
 
-        # Generate embeddings
-        self.log("\nGenerating embeddings in parallel...")
-        texts = [chunk.text for chunk in all_chunks]
-        embeddings = self.embedding_manager.generate_embeddings(texts)
-        
-        # Handle deduplication
-        if skip_dedup:
-            self.log("Skipping deduplication...")
-            unique_embeddings = embeddings
-            unique_indices = list(range(len(embeddings)))
-        else:
-            self.log("Deduplicating vectors...")
-            unique_embeddings, unique_indices = self.embedding_manager.deduplicate_vectors(embeddings)
-            self.log(f"Unique vectors: {len(unique_embeddings)} out of {len(embeddings)} total")
-
-        # Create and save FAISS index
-        self.log("Creating FAISS index...")
-        self.faiss_index = FAISSIndex(unique_embeddings.shape[1])
-        self.faiss_index.add_vectors(unique_embeddings)
-        
-        # Save database files
+        return all_chunks
+
+    def add_pdfs(self, pdf_files: List[str], skip_dedup: bool = False, db_name: str = None) -> int:
+        # Append new PDFs to the loaded database and publish a new version
+        # New vectors are only compared with the existing index and with each other,
+        # so the cost scales with the number of inserted chunks, not with the database size
+        # Returns the number of vectors added
+        apply_host_profile()
+        db_name = db_name or self.db_name
+        with self._state_lock:
+            faiss_index, metadata_manager = self.faiss_index, self.metadata_manager
+        if faiss_index is None or not db_name:
+            print("No database loaded!")
+            return 0
+
+        # PDFs already in the database are not ingested twice
+        new_files = [pdf_path for pdf_path in pdf_files if pdf_path not in metadata_manager.metadata]
+        self.log(f"\n{len(pdf_files) - len(new_files)} PDF files already in database, {len(new_files)} to add")
+        if not new_files:
+            return 0
+
+        with MemoryGovernor() as governor:
+            self.log("\nExtracting text from PDFs...")
+            page_cache = PageTextCache() if Config.PAGE_CACHE_ENABLED else None
+            extracted_texts = parallel_extract_text_from_pdfs(new_files, page_cache=page_cache, governor=governor)
+            new_chunks = self.chunk_pages(extracted_texts, metadata_manager.next_chunk_id())
+            del extracted_texts
+
+            # The new version is built on copies, searches keep using the current one until it is swapped in
+            # Vectors are compared with the existing index while being added
+            faiss_index = faiss_index.copy()
+            metadata_manager = metadata_manager.copy()
+            added = self.embed_and_index(new_chunks, skip_dedup, governor, faiss_index)
+            for text_chunk in new_chunks:
+                metadata_manager.add_chunk(text_chunk)
+
         self.log("Saving database files...")
-        self.metadata_manager.save_metadata(os.path.join(database_path, f"{db_name}.json"))
-        self.faiss_index.save_index(os.path.join(database_path, f"{db_name}.faiss"))
+        self.publish(db_name, faiss_index, metadata_manager, {"memory": governor.summary()})
+        return added
+
+    def mark_text_duplicates(self, chunks: List[TextChunk]) -> List[TextChunk]:
+        # Record exact and near duplicate chunks as aliases of their canonical chunk
+        # Returns the canonical chunks, the only ones that need an embedding
+        deduplicator = TextDeduplicator()
+        canonical_chunks = []
+        for chunk in tqdm(chunks, desc="Fingerprinting chunks", unit="chunks"):
+            chunk.alias_of = deduplicator.add(chunk.chunk_id, chunk.text)
+            if chunk.alias_of is None:
+                canonical_chunks.append(chunk)
+
+        exact, near = deduplicator.stats()
+        self.log(f"Duplicate texts: {exact} exact, {near} near, {len(canonical_chunks)} chunks left to embed")
+        return canonical_chunks
+
+    def save_database(self, db_name: str, manifest: dict = None) -> str:
+        # Publish the loaded index and metadata as a new immutable version of the database
+        with self._state_lock:
+            faiss_index, metadata_manager = self.faiss_index, self.metadata_manager
+        return self.publish(db_name, faiss_index, metadata_manager, manifest)
+
+    def publish(self,
+                db_name: str,
+                faiss_index: FAISSIndex,
+                metadata_manager: MetadataManager,
+                manifest: dict = None) -> str:
+        # Publish index and metadata as a new version, then make them the live state in one swap
+        version = SnapshotManager(db_name).publish(faiss_index, metadata_manager, manifest)
+        self._swap_state(faiss_index, metadata_manager, db_name, version)
+        self.log(f"Published version {version} of {db_name}")
+        return version
 
     def search(self, query: str, k: int = Config.DEFAULT_TOP_K) -> List[dict]:
         # Search the vector database for similar texts
+        # Take a consistent view of index and metadata, a hot reload may swap them meanwhile
+        with self._state_lock:
+            faiss_index, metadata_manager = self.faiss_index, self.metadata_manager
+
         query_embedding = self.embedding_manager.generate_embeddings([query])
-        distances, indices = self.faiss_index.search(query_embedding, k)
+        distances, indices = faiss_index.search(query_embedding, k)
         
         # Format search results
         results = []
-        all_chunks = []
-        for chunks in self.metadata_manager.metadata.values():
-            all_chunks.extend(chunks)
-        
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(all_chunks):
-                chunk = all_chunks[idx]
+        for distance, chunk_id in zip(distances[0], indices[0]):
+            chunk = metadata_manager.get_chunk(int(chunk_id))
+            if chunk is not None:
                 results.append({
                     'text': chunk.text,
                     'pdf_path': chunk.pdf_path,
                     'page': chunk.page_number,
-                    'similarity_score': 1 - (distance / 2)
+                    'similarity_score': 1 - (distance / 2),
+                    'duplicates': [(alias.pdf_path, alias.page_number)
+                                   for alias in metadata_manager.get_aliases(chunk.chunk_id)]
                 })
         
         return results
@@ -260,14 +462,9 @@ class PDFVectorDatabase:
         # Load an existing vector database
         print("\nLoading existing database...")
         try:
-            db_path = os.path.join(Config.DATABASE_ROOT, db_name)
-            # Load metadata
-            self.metadata_manager.load_metadata(os.path.join(db_path, f"{db_name}.json"))
-            
-            # Load FAISS index
-            embeddings_dim = self.embedding_manager.model.get_sentence_embedding_dimension()
-            self.faiss_index = FAISSIndex(embeddings_dim)
-            self.faiss_index.load_index(os.path.join(db_path, f"{db_name}.faiss"))
+            version = SnapshotManager(db_name).current_version()
+            faiss_index, metadata_manager = self._load_version(db_name, version)
+            self._swap_state(faiss_index, metadata_manager, db_name, version)
             
             print("Database loaded successfully!")
             return True
@@ -275,31 +472,154 @@ class PDFVectorDatabase:
             print(f"Error loading database: {str(e)}")
             return False
 
+    def _load_version(self, db_name: str, version: str = None) -> Tuple[FAISSIndex, MetadataManager]:
+        # Load index and metadata of a version into new objects, leaving the live ones untouched
+        index_path, metadata_path = SnapshotManager(db_name).resolve_paths(version)
+
+        metadata_manager = MetadataManager()
+        metadata_manager.load_metadata(metadata_path)
+
+        faiss_index = FAISSIndex.from_file(index_path)
+        return faiss_index, metadata_manager
+
+    def reload_if_updated(self) -> bool:
+        # Swap in the latest published version if it differs from the loaded one
+        # Loading happens outside the lock so in-flight searches keep using the old version
+        if not self.db_name:
+            return False
+        version = SnapshotManager(self.db_name).current_version()
+        if version is None or version == self.current_version:
+            return False
+
+        faiss_index, metadata_manager = self._load_version(self.db_name, version)
+        self._swap_state(faiss_index, metadata_manager, version=version)
+        self.log(f"\nReloaded {self.db_name} at version {version}")
+        return True
+
+    def start_auto_reload(self, interval: float = None) -> None:
+        # Watch the database in a background thread and hot reload new versions
+        interval = Config.SNAPSHOT_POLL_INTERVAL if interval is None else interval
+        if interval <= 0 or (self._reload_thread and self._reload_thread.is_alive()):
+            return
+
+        def watch():
+            while not self._stop_reload.wait(interval):
+                try:
+                    self.reload_if_updated()
+                except Exception as e:
+                    print(f"Error reloading database: {str(e)}")
+
+        self._stop_reload.clear()
+        self._reload_thread = threading.Thread(target=watch, name=f"reload-{self.db_name}", daemon=True)
+        self._reload_thread.start()
+
+    def stop_auto_reload(self) -> None:
+        # Stop the background watcher, if any
+        self._stop_reload.set()
+        if self._reload_thread is not None:
+            self._reload_thread.join()
+            self._reload_thread = None
+
+    def memory_usage_mb(self) -> float:
+        # Estimated memory of the loaded index and metadata, used by the database cache
+        return self.memory_mb
+
+    @staticmethod
+    def _estimate_memory_mb(faiss_index: FAISSIndex, metadata_manager: MetadataManager) -> float:
+        # Size of the vectors with their ids, plus chunk texts and per chunk overhead
+        index_bytes = 0
+        if faiss_index is not None:
+            # float32 vector and int64 id per entry
+            index_bytes = faiss_index.index.ntotal * (faiss_index.stored_dimension * 4 + 8)
+        metadata_bytes = sum(len(chunk.text) + Config.DB_CACHE_CHUNK_OVERHEAD
+                             for chunk in metadata_manager.all_chunks())
+        return (index_bytes + metadata_bytes) / (1024 * 1024)
+
+    def _swap_state(self,
+                    faiss_index: FAISSIndex,
+                    metadata_manager: MetadataManager,
+                    db_name: str = None,
+                    version: str = None) -> None:
+        # Make index and metadata live in one step, searches see either the old or the new state
+        # Memory is estimated here once, not on every cache lookup
+        memory_mb = self._estimate_memory_mb(faiss_index, metadata_manager)
+        with self._state_lock:
+            self.faiss_index = faiss_index
+            self.metadata_manager = metadata_manager
+            self.memory_mb = memory_mb
+            if db_name is not None:
+                self.db_name = db_name
+            if version is not None:
+                self.current_version = version
+
     def deduplicate_existing_database(self):
         # Deduplicate the loaded database
         print("\nDeduplicating loaded database...")
+        with self._state_lock:
+            faiss_index, metadata_manager = self.faiss_index, self.metadata_manager
         try:
-            embeddings = []
-            all_chunks = []
-            for chunks in self.metadata_manager.metadata.values():
-                all_chunks.extend(chunks)
-                embeddings.extend(self.embedding_manager.generate_embeddings([chunk.text for chunk in chunks]))
+            # Aliases have no vector of their own, only canonical chunks are compared
+            all_chunks = [chunk for chunk in metadata_manager.all_chunks() if chunk.alias_of is None]
+            embeddings = self.embedding_manager.generate_embeddings([chunk.text for chunk in all_chunks])
+            ids = [chunk.chunk_id for chunk in all_chunks]
             
-            unique_embeddings, unique_indices = self.embedding_manager.deduplicate_vectors(embeddings)
+            unique_embeddings, unique_indices, duplicates = EmbeddingManager.deduplicate_against_index(
+                embeddings, ids, None)
             self.log(f"Vector deduplication: {len(unique_embeddings)} unique vectors out of {len(embeddings)} total")
             
-            # Update metadata
-            new_metadata = {pdf_path: [all_chunks[i] for i in unique_indices] 
-                            for pdf_path, chunks in self.metadata_manager.metadata.items()}
-            self.metadata_manager.metadata = new_metadata
+            # Update metadata, every chunk is kept: dropped chunks become aliases of the chunk
+            # they duplicate, and their own aliases are re-pointed to it
+            # Chunks are copied, the live metadata may still be read by searches
+            redirects = {ids[position]: chunk_id for position, chunk_id in duplicates.items()}
+            new_metadata = MetadataManager(metadata_manager.save_path)
+            for chunk in metadata_manager.all_chunks():
+                alias_of = redirects.get(chunk.chunk_id, redirects.get(chunk.alias_of, chunk.alias_of))
+                new_metadata.add_chunk(replace(chunk, alias_of=alias_of))
             
-            # Update FAISS index
-            self.faiss_index = FAISSIndex(unique_embeddings.shape[1])
-            self.faiss_index.add_vectors(unique_embeddings)
+            # Update FAISS index, keeping its reduction
+            new_index = faiss_index.empty_copy()
+            new_index.add_vectors(unique_embeddings, [ids[i] for i in unique_indices])
+            self._swap_state(new_index, new_metadata)
             print("Deduplication completed successfully!")
         except Exception as e:
             print(f"Error during deduplication: {str(e)}")
 
+    def display_reduction_report(self) -> None:
+        # Display recall and size of the loaded database at several reduced dimensions
+        print("\n=== Dimensionality reduction report ===")
+        if self.faiss_index is None or self.faiss_index.index.ntotal == 0:
+            print("No vectors loaded!")
+            return
+
+        if self.faiss_index.reduction_method:
+            # Stored vectors are reduced, mapping them back would only give approximations:
+            # re-embed a sample of chunks, spread over the database, as ground truth
+            chunks = [chunk for chunk in self.metadata_manager.all_chunks() if chunk.alias_of is None]
+            step = max(1, len(chunks) // Config.REDUCTION_REPORT_SAMPLE)
+            texts = [chunk.text for chunk in chunks[::step][:Config.REDUCTION_REPORT_SAMPLE]]
+            sample = self.embedding_manager.generate_embeddings(texts)
+        else:
+            sample = []
+            for _, vectors in self.faiss_index.iter_vectors():
+                sample.append(vectors)
+                if sum(len(block) for block in sample) >= Config.REDUCTION_REPORT_SAMPLE:
+                    break
+            sample = np.vstack(sample)[:Config.REDUCTION_REPORT_SAMPLE]
+
+        try:
+            report = reduction_report(sample)
+        except ValueError as e:
+            print(str(e))
+            return
+
+        total_vectors = self.faiss_index.index.ntotal
+        method = Config.REDUCTION_METHOD or "pca"
+        print(f"Method: {method}, sample: {len(sample)} vectors, recall@{Config.DEFAULT_TOP_K} vs full dimension")
+        print(f"{'Dimension':>10} {'Recall':>8} {'Bytes/vector':>13} {'Index size (MB)':>16}")
+        for row in report:
+            size_mb = row["bytes_per_vector"] * total_vectors / (1024 * 1024)
+            print(f"{row['dimension']:>10} {row['recall']:>8.3f} {row['bytes_per_vector']:>13} {size_mb:>16.1f}")
+
     def display_all_chunks(self) -> None:
         # Display all chunks in the loaded database
         print("\n === Displaying all chunks ===")
@@ -320,6 +640,8 @@ class PDFVectorDatabase:
                 print(f"\nChunk ID: {chunk.chunk_id}")
                 print(f"Page: {chunk.page_number}")
                 print(f"Position: {chunk.position_in_page}")
+                if chunk.alias_of is not None:
+                    print(f"Duplicate of chunk: {chunk.alias_of}")
                 print(f"Texte:\n{chunk.text}\n")
                 print("-" * 30)
         
@@ -328,6 +650,19 @@ class PDFVectorDatabase:
         print(f"Number of chunks: {total_chunks}")
         print("=" * 50)
 
+def open_database(db_name: str) -> PDFVectorDatabase:
+    # Load a database and watch it for new versions, None if it cannot be loaded
+    db = PDFVectorDatabase("")  # Empty input directory as we're loading existing db
+    if db.load_existing_database(db_name):
+        db.start_auto_reload()
+        return db
+    return None
+
+# Databases loaded in this process, switching back to one of them does not reload it
+database_registry = DatabaseRegistry(open_database,
+                                     PDFVectorDatabase.memory_usage_mb,
+                                     PDFVectorDatabase.stop_auto_reload)
+
 def create_new_database():
     # Create a new vector database
     db_name = input("Enter new database name: ")
@@ -384,6 +719,23 @@ def create_new_database():
     db.process_pdfs(progress_callback if Config.VERBOSE else None, skip_dedup, db_name)
     return db
 
+def add_to_existing_database():
+    # Add PDFs from a directory to an existing vector database
+    db = load_existing_database()
+    if db is None:
+        return None
+
+    input_directory = input("Enter directory with PDF files you want to add: ")
+    pdf_files = get_pdf_files(input_directory)
+    if not pdf_files:
+        print("No PDF files found in the input directory!")
+        return db
+
+    skip_dedup = input("\nDo you want to skip deduplication? (y/N): ").lower() == 'y'
+    added = db.add_pdfs(pdf_files, skip_dedup)
+    print(f"\n{added} new vectors added to {db.db_name}")
+    return db
+
 def load_existing_database():
     # Load an existing vector database
     print("\nDisplaying existing databases...")
@@ -402,41 +754,42 @@ def load_existing_database():
         # Ask user to select a database
         db_name = input("\nEnter database name to load: ")
         
-        # Initialize and load database
-        db = PDFVectorDatabase("")  # Empty input directory as we're loading existing db
-        if db.load_existing_database(db_name):
-            return db
+        # Get database from the cache, loading it if needed
+        return database_registry.get(db_name)
     except Exception as e:
         print(f"Error loading database: {str(e)}")
     
     return None
 
+def display_database_cache_stats() -> None:
+    # Display databases kept loaded in this process and cache efficiency
+    stats = database_registry.stats()
+    print("\n=== Database Cache ===")
+    print(f"Loaded databases: {', '.join(stats['loaded']) or 'none'}")
+    print(f"Estimated memory: {stats['memory_mb']:.1f} / {stats['budget_mb']:.0f} MB")
+    print(f"Hits: {stats['hits']}, misses: {stats['misses']} (hit rate {stats['hit_rate']:.0%})")
+    print(f"Evictions: {stats['evictions']}")
+    print(f"Average load time: {stats['average_load_seconds']:.2f} seconds")
+
 ####################################################
 # Benchmarking and estimation functions for Config #
 ####################################################
 
 def estimate_processing_time(pdf_files: List[str]) -> tuple[float, float]:
     # Estimate processing time and memory usage for PDF files
-    total_pages = 0
     try:
-        # Count total pages in all PDF files
-        for pdf_path in pdf_files:
-            doc = fitz.open(pdf_path)
-            total_pages += len(doc)
-            doc.close()
+        # Count total pages in all PDF files (cached and in parallel)
+        total_pages = sum(count_pages(pdf_files).values())
             
-        # Calculate estimated time and memory usages
-        estimated_minutes = (total_pages / Config.pages_per_second) / 60
-        estimated_memory_gb = (total_pages * Config.mb_per_page) / 1024
-        
-        return estimated_minutes, estimated_memory_gb
+        # Calculate estimated time and memory usages from this host's cost model
+        return CostModel.load().estimate(total_pages)
         
     except Exception as e:
         print(f"Error estimating processing time: {str(e)}")
         return 0, 0
 
 def run_benchmark() -> tuple[float, float]:
-    # Run a benchmark to estimate processing speed and memory usage
+    # Run a benchmark to calibrate the cost of each ingestion stage on this host
     benchmark_path = Config.BENCHMARK_FILE
     if not os.path.exists(benchmark_path):
         print(f"Benchmark file not found: {benchmark_path}")
@@ -444,48 +797,78 @@ def run_benchmark() -> tuple[float, float]:
 
     try:
         print("\nStarting benchmark...")
-        # Initialize time and memory tracking
-        start_time = time.time()
-        start_memory = psutil.Process().memory_info().rss / (1024 * 1024)  # MB
-
-        # Open benchmark PDF and count pages
+        process = psutil.Process()
+        start_memory = process.memory_info().rss / (1024 * 1024)  # MB
+
+        # Load embedding model first, its memory is the fixed cost of ingestion
+        # If another database already loaded it, keep the last calibrated value
+        model_was_loaded = is_model_loaded(Config.MODEL_NAME)
+        embedding_manager = EmbeddingManager()
+        base_memory = process.memory_info().rss / (1024 * 1024) - start_memory
+        if model_was_loaded:
+            base_memory = CostModel.load().base_memory_mb
+
+        # Measure text extraction
         doc = fitz.open(benchmark_path)
         num_pages = len(doc)
-        
-        # Simulate text extraction and chunking
-        all_chunks = []
-        with tqdm(total=num_pages, desc="Simulate pages processing", unit="pages") as pbar:
+        page_texts = []
+        extraction_start = time.perf_counter()
+        with tqdm(total=num_pages, desc="Benchmark extraction", unit="pages") as pbar:
             for page_num in range(num_pages):
-                page = doc[page_num]
-                text = page.get_text()
-                cleaned_text = clean_text(text)
+                cleaned_text = clean_text(doc[page_num].get_text())
                 if cleaned_text:
-                    chunks = split_text_into_chunks(cleaned_text)
-                    all_chunks.extend(chunks)
+                    page_texts.append(cleaned_text)
                 pbar.update(1)
+        extraction_time = time.perf_counter() - extraction_start
+        doc.close()
 
-        # Simulate embeddings generation
-        total_chars = 0
-        with tqdm(total=len(all_chunks), desc="Simulate embeddings", unit="chunks") as pbar:
-            for chunk in all_chunks:
-                total_chars += len(chunk)
-                pbar.update(1)
-        
-        # Simulate memory usage for embeddings
-        simulated_embedding_size = total_chars * 4  
-
-        end_time = time.time()
-        end_memory = psutil.Process().memory_info().rss / (1024 * 1024)  # MB
-        
-        # Add simulated memory usage
-        end_memory += simulated_embedding_size / (1024 * 1024)  # MB
-
-        # Calcul of the benchmark results
-        processing_time = end_time - start_time
-        pages_per_second = num_pages / processing_time
-        mb_per_page = (end_memory - start_memory) / num_pages
+        # Measure chunking
+        all_chunks = []
+        chunking_start = time.perf_counter()
+        for text in page_texts:
+            all_chunks.extend(split_text_into_chunks(text))
+        chunking_time = time.perf_counter() - chunking_start
+        pages_memory = process.memory_info().rss / (1024 * 1024) - start_memory - base_memory
+
+        if not all_chunks:
+            print("Benchmark file contains no extractable text!")
+            return Config.DEFAULT_PAGES_PER_SECOND, Config.DEFAULT_MB_PER_PAGE
+
+        # Measure embedding generation
+        total_tokens = sum(len(chunk.split()) for chunk in all_chunks)
+        total_chars = sum(len(chunk) for chunk in all_chunks)
+        embedding_start = time.perf_counter()
+        embeddings = embedding_manager.generate_embeddings(all_chunks)
+        embedding_time = time.perf_counter() - embedding_start
+
+        # Measure index insertion
+        index_start = time.perf_counter()
+        faiss_index = FAISSIndex(embeddings.shape[1])
+        faiss_index.add_vectors(embeddings)
+        index_time = time.perf_counter() - index_start
+
+        # Vector memory: float32 embedding plus the chunk text kept in metadata
+        mb_per_vector = (embeddings.shape[1] * 4 + total_chars / len(all_chunks)) / (1024 * 1024)
+
+        cost_model = CostModel(
+            extraction_seconds_per_page=extraction_time / num_pages,
+            chunking_seconds_per_page=chunking_time / num_pages,
+            embedding_seconds_per_token=embedding_time / max(total_tokens, 1),
+            index_add_seconds_per_vector=index_time / len(embeddings),
+            tokens_per_page=total_tokens / num_pages,
+            chunks_per_page=len(all_chunks) / num_pages,
+            base_memory_mb=max(base_memory, 0.0),
+            mb_per_page=max(pages_memory, 0.0) / num_pages,
+            mb_per_vector=mb_per_vector,
+            host=get_host_id(),
+            model_name=Config.MODEL_NAME,
+            calibrated_at=time.time()
+        )
+        cost_model.save()
 
         # Update Config values
+        pages_per_second = 1.0 / cost_model.seconds_per_page
+        mb_per_page = cost_model.mb_per_page + cost_model.chunks_per_page * cost_model.mb_per_vector
         Config.pages_per_second = pages_per_second
         Config.mb_per_page = mb_per_page
 
@@ -493,12 +876,16 @@ def run_benchmark() -> tuple[float, float]:
         print("\n=== Benchmark Results ===")
         print(f"Processed pages: {num_pages}")
         print(f"Generated chunks: {len(all_chunks)}")
-        print(f"Text volume: {total_chars:,} characters")
-        print(f"Total time: {processing_time:.2f} seconds")
+        print(f"Text volume: {total_chars:,} characters ({total_tokens:,} tokens)")
+        print(f"Extraction: {cost_model.extraction_seconds_per_page * 1000:.2f} ms/page")
+        print(f"Chunking: {cost_model.chunking_seconds_per_page * 1000:.2f} ms/page")
+        print(f"Embedding: {cost_model.embedding_seconds_per_token * 1000:.3f} ms/token")
+        print(f"Index add: {cost_model.index_add_seconds_per_vector * 1000:.3f} ms/vector")
         print(f"Speed: {pages_per_second:.2f} pages/second")
+        print(f"Model memory: {cost_model.base_memory_mb:.2f} MB")
         print(f"Memory per page: {mb_per_page:.2f} MB")
+        print(f"Cost model saved for host {cost_model.host}")
 
-        doc.close()
         return pages_per_second, mb_per_page
 
     except Exception as e:
@@ -2,7 +2,11 @@ import os
 from config import Config
 from function_and_class.display import display_banner
 from enum import Enum, auto
-from function_and_class.utils import load_existing_database, create_new_database, run_benchmark
+from function_and_class.utils import load_existing_database, create_new_database, add_to_existing_database, run_benchmark
+from function_and_class.utils import database_registry, display_database_cache_stats
+from function_and_class.distributed import build_distributed_database
+from function_and_class.autotune import run_tuning
+from function_and_class.transfer import export_existing_database, import_exported_database
 
 
 ######################################
@@ -16,6 +20,13 @@ class MenuAction(Enum):
     RUN_BENCHMARK = auto()
     DEDUPLICATE_DB = auto()
     DISPLAY_CHUNKS = auto()
+    ADD_PDFS = auto()
+    DISTRIBUTED_BUILD = auto()
+    TUNE_HOST = auto()
+    REDUCTION_REPORT = auto()
+    CACHE_STATS = auto()
+    EXPORT_DB = auto()
+    IMPORT_DB = auto()
     QUIT = auto()
 
 def get_menu_choice() -> MenuAction:
@@ -25,9 +36,16 @@ def get_menu_choice() -> MenuAction:
     print("3. Run benchmark")
     print("4. Deduplicate existing database")
     print("5. Display all chunks")
-    print("6. Quit")
+    print("6. Add PDFs to existing database")
+    print("7. Build database in shards and merge")
+    print("8. Tune workers and batch sizes for this host")
+    print("9. Dimensionality reduction report")
+    print("10. Database cache statistics")
+    print("11. Export database")
+    print("12. Import exported database")
+    print("13. Quit")
     
-    choice = input("\nSelect an option (1-6): ")
+    choice = input("\nSelect an option (1-13): ")
     
     match choice:
         case "1": return MenuAction.CREATE_DB
@@ -35,7 +53,14 @@ def get_menu_choice() -> MenuAction:
         case "3": return MenuAction.RUN_BENCHMARK
         case "4": return MenuAction.DEDUPLICATE_DB
         case "5": return MenuAction.DISPLAY_CHUNKS
-        case "6": return MenuAction.QUIT
+        case "6": return MenuAction.ADD_PDFS
+        case "7": return MenuAction.DISTRIBUTED_BUILD
+        case "8": return MenuAction.TUNE_HOST
+        case "9": return MenuAction.REDUCTION_REPORT
+        case "10": return MenuAction.CACHE_STATS
+        case "11": return MenuAction.EXPORT_DB
+        case "12": return MenuAction.IMPORT_DB
+        case "13": return MenuAction.QUIT
         case _: return None
 
 #################
@@ -47,6 +72,7 @@ def main():
     display_banner()
     while True:
         action = get_menu_choice()
+        previous_db = db
         
         match action:
             case MenuAction.CREATE_DB:
@@ -67,12 +93,34 @@ def main():
                     db.display_all_chunks()
                 else:
                     print("\nNo database loaded!")
+            case MenuAction.ADD_PDFS:
+                db = add_to_existing_database()
+            case MenuAction.DISTRIBUTED_BUILD:
+                db = build_distributed_database()
+            case MenuAction.TUNE_HOST:
+                run_tuning()
+            case MenuAction.REDUCTION_REPORT:
+                if db is not None:
+                    db.display_reduction_report()
+                else:
+                    print("\nNo database loaded!")
+            case MenuAction.CACHE_STATS:
+                display_database_cache_stats()
+            case MenuAction.EXPORT_DB:
+                export_existing_database()
+            case MenuAction.IMPORT_DB:
+                db = import_exported_database()
             case MenuAction.QUIT:
                 print("Goodbye!")
                 break
             case None:
                 print("Invalid option. Please try again.")
                 continue
+
+        # Stop watching the previous database for new versions once replaced,
+        # unless it stays loaded in the database cache
+        if previous_db is not None and db is not previous_db and not database_registry.holds(previous_db):
+            previous_db.stop_auto_reload()
         
         if db is not None:
             # Search loop
@@ -87,6 +135,8 @@ def main():
                     print(f"\n{i}. Similarity score: {result['similarity_score']:.2f}")
                     print(f"PDF: {os.path.basename(result['pdf_path'])}")
                     print(f"Page: {result['page']}")
+                    if result['duplicates']:
+                        print(f"Also found in {len(result['duplicates'])} other place(s)")
                     print(f"Excerpt: {result['text'][:Config.MAX_DISPLAY_CHARS]}...")
 
 if __name__ == "__main__":